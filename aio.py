@@ -0,0 +1,139 @@
+"""
+Asyncio versions of the fetch functions in `alexa` and `whois`.
+They return the same json structures as their synchronous counterparts.
+
+Requirement
+--------
+**python 3**
+**aiohttp** 3.0 + : https://github.com/aio-libs/aiohttp
+
+Example
+--------
+Fetch several websites concurrently over one shared connection pool:
+```
+import asyncio
+import aio
+
+async def main():
+    async with aio.Client(max_concurrency=20) as client:
+        infos = await asyncio.gather(*[client.get_website_info(d) for d in ["google.com", "python.org"]])
+        record = await client.who_is("google.com")
+
+asyncio.run(main())
+```
+"""
+
+import asyncio
+import aiohttp
+import alexa
+import whois
+
+class Client():
+    """
+    An async client holding one `aiohttp.ClientSession`, so every request made through it
+    shares the same keep-alive connection pool.
+    At most `max_concurrency` requests are in flight at once, and at most `limit_per_host`
+    connections are opened to the same host (0 means no per-host limit).
+    `timeout` is the total number of seconds allowed for one request.
+    Pages are parsed on the `concurrent.futures` executor `executor` (the loop's default thread pool
+    by default) rather than on the event loop, which keeps reading the other responses meanwhile:
+    a siteinfo page takes about 9 ms of CPU to parse. Threads parse one page at a time under the GIL,
+    so this bounds the latency added to the other requests, not the parsing time; pass a
+    `concurrent.futures.ProcessPoolExecutor` to parse on several cores, at the cost of copying every page
+    to a worker process. The parser backend of worker processes is their own (see `backend.set_backend`).
+    """
+    def __init__(self, max_concurrency=10, limit_per_host=0, timeout=30, executor=None):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._limit = max_concurrency
+        self._limit_per_host = limit_per_host
+        self._timeout = timeout
+        self._executor = executor
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit, limit_per_host=self._limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout))
+        return self._session
+
+    async def _fetch_text(self, url):
+        async with self._semaphore:
+            async with self._get_session().get(url) as r:
+                if r.status != 200:
+                    r.raise_for_status()
+                    return None
+                return await r.text()
+
+    async def _parse(self, parse, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, parse, *args)
+
+    async def get_website_info(self, url, sections=None):
+        """
+        Async version of `alexa.get_website_info`.
+        """
+        text = await self._fetch_text(alexa._siteinfo_base_url + url)
+        if text is not None:
+            return await self._parse(alexa._parse_website_info, text, sections)
+
+    async def get_topsites_by_category(self, category):
+        """
+        Async version of `alexa.get_topsites_by_category`.
+        """
+        result = {"category": category}
+        try:
+            for i in range(21):
+                text = await self._fetch_text(alexa._orient_topsite_url(category, i))
+                if text is not None:
+                    page = await self._parse(alexa._parse_topsite_page, text)
+                    if len(page) > 0: result.setdefault("list", []).extend(page)
+        except IndexError as identifier:
+            if identifier.args[0] != ("NSFTC"): raise identifier
+        return result
+
+    async def who_is(self, domain_name):
+        """
+        Async version of `whois.who_is`.
+        """
+        text = await self._fetch_text(whois._whois_base_url + domain_name)
+        if text is not None:
+            return await self._parse(whois.who_is_from_str, text)
+
+
+async def get_website_info(url, client=None, sections=None):
+    """
+    Async version of `alexa.get_website_info`.
+    Pass a `Client` as `client` to reuse its connection pool; otherwise a one-off client is used.
+    """
+    if client is not None: return await client.get_website_info(url, sections)
+    async with Client() as client:
+        return await client.get_website_info(url, sections)
+
+async def get_topsites_by_category(category, client=None):
+    """
+    Async version of `alexa.get_topsites_by_category`.
+    Pass a `Client` as `client` to reuse its connection pool; otherwise a one-off client is used.
+    """
+    if client is not None: return await client.get_topsites_by_category(category)
+    async with Client() as client:
+        return await client.get_topsites_by_category(category)
+
+async def who_is(domain_name, client=None):
+    """
+    Async version of `whois.who_is`.
+    Pass a `Client` as `client` to reuse its connection pool; otherwise a one-off client is used.
+    """
+    if client is not None: return await client.who_is(domain_name)
+    async with Client() as client:
+        return await client.who_is(domain_name)
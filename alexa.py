@@ -28,9 +28,16 @@ import requests
 import html.parser as htmlparser
 import urllib.parse as urlparse
 import json
+import concurrent.futures
+import bulk
+import transport
+import streaming
+import backend
+import instrument
 
 _siteinfo_base_url = "http://www.alexa.com/siteinfo/"
 _topsite_base_url = "http://www.alexa.com/topsites/category"
+_max_topsite_page = 20
 
 class _parser_impl_base():
     def __init__(self, target_data):
@@ -43,6 +50,10 @@ class _parser_impl_base():
     def handle_endtag(self, tag): return
 
 
+class _done_parser(_parser_impl_base):
+    pass
+
+
 class _gender_parser(_parser_impl_base):
     def __init__(self, target_dict):
         self._parsed_data = target_dict
@@ -97,6 +108,7 @@ class _gender_parser(_parser_impl_base):
             #global self._parsed_data
             self._parsed_data["visitor location"]['work'] = str(self._l / 200.0)
             self._l = 0
+            return _done_parser(self._parsed_data)
 
 
 class _loadspeed_parser(_parser_impl_base):
@@ -392,10 +404,16 @@ class _root_parser(_parser_impl_base):
 
 
 class _AlexaSiteInfoHTMLParser(htmlparser.HTMLParser):
+    # Walks the page through the chain of per-section parsers starting at `_root_parser`.
+    # Superseded by `_AlexaSiteInfoTableParser`, and kept as its reference implementation.
     def __init__(self):
         self._parsed_data = {}
         self._parser = _root_parser(self._parsed_data)
         return htmlparser.HTMLParser.__init__(self)
+
+    @property
+    def done(self):
+        return isinstance(self._parser, _done_parser)
     
     def handle_starttag(self, tag, attrs):
         r = self._parser.handle_starttag(tag, attrs)
@@ -403,7 +421,9 @@ class _AlexaSiteInfoHTMLParser(htmlparser.HTMLParser):
             self._parser = r
     
     def handle_data(self, data):
-        self._parser.handle_data(data)
+        r = self._parser.handle_data(data)
+        if r != None:
+            self._parser = r
     
     def handle_endtag(self, tag):
         r = self._parser.handle_endtag(tag)
@@ -411,6 +431,392 @@ class _AlexaSiteInfoHTMLParser(htmlparser.HTMLParser):
             self._parser = r
 
 
+# States of `_AlexaSiteInfoTableParser`, one per parser class of the `_root_parser` chain above.
+(_ROOT, _RANK_SEC, _GLOBAL_RANK, _LOCAL_RANK, _VISITOR_TABLE, _VISITOR_TBODY, _ENGAGEMENT_CONTENT,
+    _ENGAGEMENT, _KEYWORD_TABLE, _KEYWORD_TBODY, _UPSTREAM_TBODY, _LINKSIN, _RELATED_CONTENT,
+    _RELATED_TBODY, _CATEGORY, _SUBDOMAIN, _LOADSPEED, _GENDER, _DONE) = range(19)
+
+_summary_sel = ("class", "row-fluid summary")
+_bottom_sel = ("class", "bottom")
+_country_table_sel = ("id", "demographics_div_country_table")
+_engagement_sel = ("id", "engagement-content")
+_keywords_table_sel = ("id", "keywords_top_keywords_table")
+_empty_class_sel = ("class", "")
+_linksin_sel = ("id", "linksin-panel-content")
+_linksin_total_sel = ("class", "font-4 box1-r")
+_related_sel = ("id", "related-content")
+_loadspeed_sel = ("id", "loadspeed-panel-content")
+_gender_sel = ("class", "row-fluid col-pad pybar demo-gender")
+
+# The state entered once each section of the result is complete.
+_section_ends = {
+    "rank": _VISITOR_TABLE,
+    "country": _VISITOR_TABLE,
+    "visitor by country": _ENGAGEMENT_CONTENT,
+    "user engagement": _KEYWORD_TABLE,
+    "keywords": _UPSTREAM_TBODY,
+    "upstreams": _LINKSIN,
+    "total sites linking in": _RELATED_CONTENT,
+    "related sites": _CATEGORY,
+    "category": _SUBDOMAIN,
+    "subdomains": _LOADSPEED,
+    "loadspeed": _GENDER,
+    "visitor gender": _DONE,
+    "visitor education": _DONE,
+    "visitor location": _DONE,
+}
+
+_gender_labels = {
+    "Female": ("visitor gender", "male"),
+    "No College": ("visitor gender", "female"),
+    "Some College": ("visitor education", "no college"),
+    "Graduate School": ("visitor education", "some college"),
+    "College": ("visitor education", "graduate"),
+    "Home": ("visitor education", "college"),
+    "School": ("visitor location", "home"),
+    "Work": ("visitor location", "school"),
+    "Login with Facebook": ("visitor location", "work"),
+}
+
+class _any_tag(dict):
+    # A dispatch entry matching every tag.
+    def __init__(self, handler):
+        dict.__init__(self)
+        self._handler = handler
+
+    def get(self, tag, default=None):
+        return self._handler
+
+class _AlexaSiteInfoTableParser(htmlparser.HTMLParser):
+    """
+    A single-object, table-driven equivalent of `_AlexaSiteInfoHTMLParser`.
+    The parse state is an integer, and each event is dispatched through per-state tables
+    keyed by tag name, so tags a state does not care about cost one dict lookup.
+    Once the last section is parsed, `done` is set and the rest of the page is not tokenized.
+    With `sections` set to a collection of result keys (see `_section_ends`), parsing stops
+    as soon as all of those are complete.
+    The parser can be reused for another page after `reset()`.
+    """
+    def __init__(self, sections=None):
+        self._sections = None if sections is None else frozenset(sections)
+        self._stop_state = _DONE
+        if sections is not None:
+            for section in self._sections:
+                if section not in _section_ends: raise ValueError("Unknown siteinfo section: " + str(section))
+            self._stop_state = max([_section_ends[section] for section in self._sections] or [_VISITOR_TABLE])
+        htmlparser.HTMLParser.__init__(self)
+
+    def reset(self):
+        htmlparser.HTMLParser.reset(self)
+        self._parsed_data = {}
+        self._goto(_ROOT)
+        self._ready = False
+        self._final = False
+        self._next_is_country = False
+        self._index = 0
+        self._v_ready = False
+        self._buffer = None
+        self._href = ""
+        self._stop = False
+        self._l = 0
+
+    @property
+    def done(self):
+        return self._state == _DONE
+
+    def feed(self, data):
+        if self._state == _DONE: return
+        try:
+            htmlparser.HTMLParser.feed(self, data)
+        except backend.ParseComplete:
+            pass
+
+    def close(self):
+        if self._state != _DONE: htmlparser.HTMLParser.close(self)
+
+    def handle_starttag(self, tag, attrs):
+        h = self._on_start.get(tag)
+        if h is not None: h(self, attrs)
+
+    def handle_data(self, data):
+        h = self._on_data
+        if h is not None: h(self, data)
+
+    def handle_endtag(self, tag):
+        h = self._on_end.get(tag)
+        if h is not None: h(self)
+
+    def _goto(self, state):
+        if state >= self._stop_state: state = _DONE
+        self._state = state
+        self._on_start = self._start_table[state]
+        self._on_data = self._data_table[state]
+        self._on_end = self._end_table[state]
+        if state == _DONE: raise backend.ParseComplete()
+
+    def _enter(self, state):
+        self._goto(state)
+        self._ready = False
+        self._final = False
+        self._index = -1
+        # As with the chain, a value met before its key is an error rather than filed under a stale key.
+        self.__dict__.pop("_k", None)
+
+    # rank
+    def _root_div(self, attrs):
+        if attrs and attrs[0] == _summary_sel: self._goto(_RANK_SEC)
+
+    def _rank_sec_span(self, attrs):
+        if attrs and attrs[0] == _bottom_sel:
+            self._enter(_GLOBAL_RANK)
+            self._next_is_country = False
+
+    def _global_rank_strong(self, attrs):
+        if not self._final: self._ready = True
+
+    def _global_rank_span(self, attrs):
+        if attrs and attrs[0] == _bottom_sel: self._enter(_LOCAL_RANK)
+
+    def _global_rank_data(self, data):
+        if data.strip() == "": return
+        if self._ready:
+            self._parsed_data["rank"] = {"global": data.strip()}
+            self._ready = False
+            self._final = True
+        elif data == "Rank in ":
+            self._next_is_country = True
+        elif self._next_is_country:
+            self._parsed_data["country"] = data.strip()
+            self._next_is_country = False
+
+    def _local_rank_strong(self, attrs):
+        if not self._final: self._ready = True
+
+    def _local_rank_data(self, data):
+        if data.strip() == "": return
+        if self._ready:
+            self._parsed_data["rank"]["local"] = data.strip()
+            self._ready = False
+            self._final = True
+
+    def _local_rank_end_strong(self):
+        self._enter(_VISITOR_TABLE)
+
+    # visitors by country
+    def _visitor_table_table(self, attrs):
+        if len(attrs) > 2 and attrs[2] == _country_table_sel: self._ready = True
+
+    def _visitor_table_tbody(self, attrs):
+        if self._ready:
+            self._enter(_VISITOR_TBODY)
+            self._buffer = {}
+            self._parsed_data["visitor by country"] = []
+
+    def _visitor_tbody_data(self, data):
+        if data.strip() == "": return
+        self._index += 1
+        i = self._index % 3
+        if i == 0:
+            self._buffer["country"] = data[2:]
+        elif i == 1:
+            self._buffer["percentage"] = data
+        else:
+            self._buffer["rank in country"] = data
+            self._parsed_data["visitor by country"].append(self._buffer)
+            self._buffer = {}
+
+    def _visitor_tbody_end_tbody(self):
+        self._goto(_ENGAGEMENT_CONTENT)
+
+    # user engagement
+    def _engagement_content_section(self, attrs):
+        if attrs and attrs[0] == _engagement_sel:
+            self._enter(_ENGAGEMENT)
+            self._index = 0
+            self._parsed_data["user engagement"] = {}
+
+    def _engagement_strong(self, attrs):
+        self._index += 1
+        self._ready = True
+
+    def _engagement_data(self, data):
+        if self._ready:
+            if self._index == 1:
+                self._parsed_data["user engagement"]["bounce rate"] = data.strip()
+            elif self._index == 2:
+                self._parsed_data["user engagement"]["daily pageviews per visitor"] = data.strip()
+            else:
+                self._parsed_data["user engagement"]["daily time on site"] = data.strip()
+
+    def _engagement_end(self):
+        self._ready = False
+        if self._index == 3: self._enter(_KEYWORD_TABLE)
+
+    # keywords and upstream sites
+    def _keyword_table_table(self, attrs):
+        if len(attrs) > 2 and attrs[2] == _keywords_table_sel: self._ready = True
+
+    def _keyword_table_tbody(self, attrs):
+        if self._ready:
+            self._enter(_KEYWORD_TBODY)
+            self._parsed_data["keywords"] = {}
+
+    def _keyword_tbody_td(self, attrs):
+        if len(attrs) == 2: self._k = attrs[1][1]
+
+    def _keyword_tbody_span(self, attrs):
+        if len(attrs) == 1 and attrs[0] == _empty_class_sel: self._ready = True
+
+    def _keyword_tbody_tbody(self, attrs):
+        self._enter(_UPSTREAM_TBODY)
+        self._v_ready = False
+        self._parsed_data["upstreams"] = {}
+
+    def _keyword_tbody_data(self, data):
+        if self._ready:
+            self._parsed_data["keywords"][self._k] = data.strip()
+            self._ready = False
+
+    def _upstream_tbody_a(self, attrs):
+        if self._index < 5: self._ready = True
+
+    def _upstream_tbody_span(self, attrs):
+        if self._index < 5 and len(attrs) == 1 and attrs[0] == _empty_class_sel: self._v_ready = True
+
+    def _upstream_tbody_section(self, attrs):
+        if self._index >= 5 and attrs and attrs[0] == _linksin_sel: self._enter(_LINKSIN)
+
+    def _upstream_tbody_data(self, data):
+        if data.strip() == "": return
+        if self._ready:
+            self._index += 1
+            self._k = data
+            self._ready = False
+        elif self._v_ready:
+            self._parsed_data["upstreams"][self._k] = data.strip()
+            self._v_ready = False
+
+    # sites linking in, related sites and category
+    def _linksin_span(self, attrs):
+        if attrs and attrs[0] == _linksin_total_sel: self._ready = True
+
+    def _linksin_section(self, attrs):
+        if attrs and attrs[0] == _related_sel: self._goto(_RELATED_CONTENT)
+
+    def _linksin_data(self, data):
+        if self._ready:
+            self._parsed_data["total sites linking in"] = data
+            self._ready = False
+
+    def _related_content_tbody(self, attrs):
+        self._enter(_RELATED_TBODY)
+        self._index = 0
+        self._parsed_data["related sites"] = []
+
+    def _related_tbody_a(self, attrs):
+        if self._index < 10: self._ready = True
+
+    def _related_tbody_tbody(self, attrs):
+        self._goto(_CATEGORY)
+        self._href = ""
+        self._stop = False
+
+    def _related_tbody_data(self, data):
+        if self._ready:
+            self._parsed_data["related sites"].append(data.strip())
+            self._index += 1
+            self._ready = False
+
+    def _category_a(self, attrs):
+        if not self._stop: self._href = attrs[0][1]
+
+    def _category_tbody(self, attrs):
+        self._enter(_SUBDOMAIN)
+        self._parsed_data["subdomains"] = {}
+
+    def _category_end_tbody(self):
+        self._stop = True
+        self._parsed_data["category"] = urlparse.unquote(self._href[19:])
+
+    # subdomains, load speed and demographics
+    def _subdomain_span(self, attrs):
+        if self._index < 9: self._ready = True
+
+    def _subdomain_section(self, attrs):
+        if attrs and attrs[0] == _loadspeed_sel:
+            self._goto(_LOADSPEED)
+            self._ready = True
+
+    def _subdomain_data(self, data):
+        if data.strip() == "": return
+        if self._ready:
+            self._index += 1
+            if self._index % 2 == 0:
+                self._k = data.strip()
+            else:
+                self._parsed_data["subdomains"][self._k] = data.strip()
+                self._ready = False
+
+    def _loadspeed_div(self, attrs):
+        if attrs and attrs[0] == _gender_sel:
+            self._goto(_GENDER)
+            self._parsed_data["visitor gender"] = {}
+            self._parsed_data["visitor education"] = {}
+            self._parsed_data["visitor location"] = {}
+            self._ready = False
+            self._l = 0
+
+    def _loadspeed_data(self, data):
+        if data.strip() == "": return
+        if self._ready:
+            self._parsed_data["loadspeed"] = data.strip()
+            self._ready = False
+
+    def _gender_span(self, attrs):
+        if self._ready and len(attrs) == 1 and attrs[0][0] == "style":
+            self._l += int(attrs[0][1].split(":")[1].split("%")[0])
+
+    def _gender_data(self, data):
+        if data == "Male":
+            self._ready = True
+            self._l = 0
+            return
+        label = _gender_labels.get(data)
+        if label is not None:
+            self._parsed_data[label[0]][label[1]] = str(self._l / 200.0)
+            self._l = 0
+            if data == "Login with Facebook": self._goto(_DONE)
+
+_p = _AlexaSiteInfoTableParser
+_p._start_table = (
+    {"div": _p._root_div},
+    {"span": _p._rank_sec_span},
+    {"strong": _p._global_rank_strong, "span": _p._global_rank_span},
+    {"strong": _p._local_rank_strong},
+    {"table": _p._visitor_table_table, "tbody": _p._visitor_table_tbody},
+    {},
+    {"section": _p._engagement_content_section},
+    {"strong": _p._engagement_strong},
+    {"table": _p._keyword_table_table, "tbody": _p._keyword_table_tbody},
+    {"td": _p._keyword_tbody_td, "span": _p._keyword_tbody_span, "tbody": _p._keyword_tbody_tbody},
+    {"a": _p._upstream_tbody_a, "span": _p._upstream_tbody_span, "section": _p._upstream_tbody_section},
+    {"span": _p._linksin_span, "section": _p._linksin_section},
+    {"tbody": _p._related_content_tbody},
+    {"a": _p._related_tbody_a, "tbody": _p._related_tbody_tbody},
+    {"a": _p._category_a, "tbody": _p._category_tbody},
+    {"span": _p._subdomain_span, "section": _p._subdomain_section},
+    {"div": _p._loadspeed_div},
+    {"span": _p._gender_span},
+    {},
+)
+_p._data_table = (None, None, _p._global_rank_data, _p._local_rank_data, None, _p._visitor_tbody_data, None,
+    _p._engagement_data, None, _p._keyword_tbody_data, _p._upstream_tbody_data, _p._linksin_data, None,
+    _p._related_tbody_data, None, _p._subdomain_data, _p._loadspeed_data, _p._gender_data, None)
+_p._end_table = ({}, {}, {}, {"strong": _p._local_rank_end_strong}, {}, {"tbody": _p._visitor_tbody_end_tbody}, {},
+    _any_tag(_p._engagement_end), {}, {}, {}, {}, {}, {}, {"tbody": _p._category_end_tbody}, {}, {}, {}, {})
+del _p
+
+
 class _site_listing_parser(_parser_impl_base):
     def __init__(self, target_data):
         self._parsed_data = target_data
@@ -484,42 +890,345 @@ def _orient_topsite_url(category, page_count = 0):
     else:
         return "{0};{1}/Top/{2}".format(_topsite_base_url, page_count, category)
 
-def get_topsites_by_category(category):
+@instrument.measured("alexa.topsites")
+def _fetch_topsite_page(category, page_count, session):
+    r = transport.get(_orient_topsite_url(category, page_count), session)
+    if r.status_code != requests.codes.ok:
+        r.raise_for_status()
+        return None
+    return r.text
+
+def _parse_topsite_page(html_data_str):
+    page = {}
+    p = _AlexaTopSiteHTMLParser(page)
+    backend.parse(p, html_data_str)
+    return page.get("list", [])
+
+@instrument.measured("alexa.topsites")
+def _get_topsites_concurrently(category, session, window, executor):
+    # Pages are fetched `window` at a time on `executor` and parsed here as they complete.
+    # A page that is empty or fails ends the listing, so pages after it are dropped.
+    pages = {}
+    last_page = _max_topsite_page
+    next_page = 0
+    pending = {}
+    try:
+        while True:
+            while len(pending) < window and next_page <= last_page:
+                pending[executor.submit(_fetch_topsite_page, category, next_page, session)] = next_page
+                next_page += 1
+            if not pending: break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future, None)
+                if i is None or i > last_page: continue
+                try:
+                    text = future.result()
+                    pages[i] = [] if text is None else _parse_topsite_page(text)
+                except IndexError as identifier:
+                    pages[i] = None if identifier.args[0] == ("NSFTC") else identifier
+                except Exception as e:
+                    pages[i] = e
+                if pages[i] is None or isinstance(pages[i], Exception):
+                    last_page = i
+                    for f in [f for f, j in pending.items() if j > i]:
+                        f.cancel()
+                        del pending[f]
+    finally:
+        for future in pending: future.cancel()
+    result = {"category": category}
+    for i in range(last_page + 1):
+        page = pages[i]
+        if page is None: break
+        if isinstance(page, Exception): raise page
+        if len(page) > 0:
+            result.setdefault("list", []).extend(page)
+    return instrument.result_size(result)
+
+@instrument.measured("alexa.topsites")
+def get_topsites_by_category(category, session=None, window=None):
+    """
+    Return the top sites listed by alexa.com under `category`, e.g. "Arts/Design".
+    By default the listing pages are fetched one after another.
+    With `window` set, up to `window` pages are fetched concurrently;
+    pages past the first empty one are cancelled, and `result["list"]` stays in rank order.
+    """
+    if window is not None:
+        executor = concurrent.futures.ThreadPoolExecutor(window)
+        try:
+            return _get_topsites_concurrently(category, session, window, executor)
+        finally:
+            executor.shutdown(wait=False)
     result = {"category": category}
     try:
         i = 0
-        while i <= 20:
-            r = requests.get(_orient_topsite_url(category, i))
+        while i <= _max_topsite_page:
+            r = transport.get(_orient_topsite_url(category, i), session)
             if r.status_code != requests.codes.ok : r.raise_for_status()
             else:
                 p = _AlexaTopSiteHTMLParser(result)
-                p.feed(r.text)
+                backend.parse(p, r.text)
             i += 1
     except IndexError as identifier:
         if identifier.args[0] != ("NSFTC"): raise identifier
-    return result
+    return instrument.result_size(result)
+
+def get_topsites_by_categories(categories, window=4, max_in_flight=16, session=None):
+    """
+    Crawl every category in the iterable `categories`, each with `get_topsites_by_category(category, window=window)`,
+    and yield `(category, result)` pairs in completion order.
+    `result` is either the category's listing or the exception raised while fetching it.
+    At most `max_in_flight` pages are being fetched at once across all categories.
+    """
+    page_executor = concurrent.futures.ThreadPoolExecutor(max_in_flight)
+    crawl = lambda category: _get_topsites_concurrently(category, session, window, page_executor)
+    crawls = bulk.outcomes(crawl, categories, max_in_flight, window=max_in_flight)
+    try:
+        for category, result in crawls:
+            yield category, result
+    finally:
+        crawls.close()
+        page_executor.shutdown(wait=False)
 
-def get_website_info(url):
-    r = requests.get(_siteinfo_base_url+url)
-    if r.status_code != requests.codes.ok : r.raise_for_status()
-    else:
-        p = _AlexaSiteInfoHTMLParser()
-        p.feed(r.text)
-        if p._parsed_data["rank"]["global"] == "-":
-            raise ValueError("Website not found in the database.")
-        return p._parsed_data
+def _select_sections(result, sections):
+    if sections is None: return result
+    return dict((key, value) for key, value in result.items() if key in sections)
 
-def get_website_info_from_file(local_html_file):
-    with open(local_html_file, 'r', encoding="utf8") as f:
-        p = _AlexaSiteInfoHTMLParser()
-        p.feed(f.read())
-        if p._parsed_data["rank"]["global"] == "-":
-            raise ValueError("Website not found in the database.")
-        return p._parsed_data
-
-def get_website_info_from_str(html_data_str):
-    p = _AlexaSiteInfoHTMLParser()
-    p.feed(f.read())
+def _website_info_result(p):
     if p._parsed_data["rank"]["global"] == "-":
         raise ValueError("Website not found in the database.")
-    return p._parsed_data
\ No newline at end of file
+    return instrument.result_size(_select_sections(p._parsed_data, p._sections))
+
+def _parse_website_info(html_data_str, sections=None):
+    p = _AlexaSiteInfoTableParser(sections)
+    backend.parse(p, html_data_str)
+    return _website_info_result(p)
+
+def _fetch_website_page(url, session):
+    r = transport.get(_siteinfo_base_url+url, session)
+    if r.status_code != requests.codes.ok:
+        r.raise_for_status()
+        return None
+    return r.text
+
+def _stream_website_info(url, session, sections):
+    with transport.get(_siteinfo_base_url+url, session, stream=True) as r:
+        if r.status_code != requests.codes.ok:
+            r.raise_for_status()
+            return None
+        p = _AlexaSiteInfoTableParser(sections)
+        streaming.parse(p, streaming.iter_response_text(r))
+    return _website_info_result(p)
+
+@instrument.measured("alexa.siteinfo")
+def get_website_info(url, session=None, cache=None, stream=False, sections=None):
+    """
+    Return a json structure containing information fetched from http://www.alexa.com about the website `url`.
+    The request is sent through the `transport.Session` `session`, or through the default one if it is None.
+    With a `cache.DiskCache` given as `cache`, results (including "not found" ones) are served from and saved to it.
+    With `stream` set, the page is parsed while it downloads and the download stops once the last section is parsed;
+    it has no effect when `cache` is given, as the whole page is stored.
+    With `sections` set to a list of result keys, e.g. `["rank"]` or `["visitor by country"]`,
+    only those are returned, and parsing (and with `stream`, downloading) stops once they are complete.
+    """
+    if cache is not None:
+        result = cache.lookup("alexa", url, lambda: _fetch_website_page(url, session), _parse_website_info)
+        return None if result is None else _select_sections(result, sections)
+    if stream:
+        return _stream_website_info(url, session, sections)
+    text = _fetch_website_page(url, session)
+    if text is not None:
+        return _parse_website_info(text, sections)
+
+@instrument.measured("alexa.siteinfo")
+def get_website_info_from_file(local_html_file, stream=False, use_mmap=False, sections=None):
+    """
+    Return the json structure parsed from the alexa.com siteinfo page saved as `local_html_file`.
+    With `stream` set, the file is read and parsed chunk by chunk, and reading stops once the last section is parsed.
+    With `use_mmap` set, the chunks are decoded from a memory map of the file instead of being read into buffers.
+    `sections` selects the sections parsed, as for `get_website_info`.
+    """
+    if stream or use_mmap:
+        p = _AlexaSiteInfoTableParser(sections)
+        if use_mmap: chunks = streaming.iter_mmap_text(local_html_file)
+        else: chunks = streaming.iter_file_text(local_html_file)
+        streaming.parse(p, chunks)
+        return _website_info_result(p)
+    with open(local_html_file, 'r', encoding="utf8") as f:
+        return _parse_website_info(f.read(), sections)
+
+@instrument.measured("alexa.siteinfo")
+def get_website_info_from_str(html_data_str, sections=None):
+    """
+    Return the json structure parsed from the alexa.com siteinfo page content `html_data_str`.
+    `sections` selects the sections parsed, as for `get_website_info`.
+    """
+    return _parse_website_info(html_data_str, sections)
+
+def _to_int(s):
+    try:
+        return int(s.strip().replace(",", ""))
+    except (AttributeError, ValueError):
+        return None
+
+def _to_float(s):
+    try:
+        return float(s.strip().rstrip("%").replace(",", ""))
+    except (AttributeError, ValueError):
+        return None
+
+def _to_seconds(s):
+    try:
+        m, sec = s.strip().split(":")
+        return int(m) * 60 + int(sec)
+    except (AttributeError, ValueError):
+        return None
+
+def _format_int(v):
+    return "-" if v is None else "{0:,}".format(v)
+
+def _format_percent(v):
+    return "-" if v is None else str(v) + "%"
+
+def _format_float(v):
+    return "-" if v is None else str(v)
+
+def _format_seconds(v):
+    return "-" if v is None else "{0}:{1:02d}".format(v // 60, v % 60)
+
+class CountryShare():
+    """
+    The share of a website's visitors coming from `country`:
+    `percentage` is the percent of visitors (45.6 for "45.6%"), and `rank` the website's rank in that country.
+    """
+    __slots__ = ("country", "percentage", "rank")
+
+    def __init__(self, country, percentage, rank):
+        self.country = country
+        self.percentage = percentage
+        self.rank = rank
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["country"], _to_float(d["percentage"]), _to_int(d["rank in country"]))
+
+    def to_dict(self):
+        return {"country": self.country, "percentage": _format_percent(self.percentage),
+            "rank in country": _format_int(self.rank)}
+
+    def __eq__(self, other):
+        return isinstance(other, CountryShare) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "CountryShare({0!r}, {1!r}, {2!r})".format(self.country, self.percentage, self.rank)
+
+class SiteInfo():
+    """
+    A compact, typed version of the json structure returned by `get_website_info`,
+    built with `SiteInfo.from_dict(get_website_info(url))`.
+    Ranks and counts are ints, percentages are floats (38.2 for "38.20%"), the daily time on site
+    is a number of seconds, and the demographics are dicts of floats. Missing sections are None.
+    Only the typed fields are kept, so the view is lossy: `to_dict()` formats them back the same way
+    whatever the source strings were, e.g. "38.2%" for "38.20%", "-" for a missing or non-numeric number,
+    and every rank and user engagement key once one of them is set. `from_dict(r).to_dict() == r` thus only holds
+    for structures already in that form, while `SiteInfo.from_dict(info.to_dict()) == info` always holds.
+    """
+    __slots__ = ("global_rank", "local_rank", "country", "visitors_by_country", "bounce_rate",
+        "pageviews_per_visitor", "time_on_site", "keywords", "upstreams", "sites_linking_in",
+        "related_sites", "category", "subdomains", "loadspeed", "visitor_gender",
+        "visitor_education", "visitor_location")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields: raise TypeError("Unknown SiteInfo fields: " + ", ".join(fields))
+
+    @classmethod
+    def from_dict(cls, d):
+        def percents(section):
+            if section not in d: return None
+            return dict((k, _to_float(v)) for k, v in d[section].items())
+        def fractions(section):
+            if section not in d: return None
+            return dict((k, float(v)) for k, v in d[section].items())
+        rank = d.get("rank", {})
+        engagement = d.get("user engagement", {})
+        return cls(
+            global_rank=_to_int(rank.get("global")),
+            local_rank=_to_int(rank.get("local")),
+            country=d.get("country"),
+            visitors_by_country=None if "visitor by country" not in d else
+                [CountryShare.from_dict(c) for c in d["visitor by country"]],
+            bounce_rate=_to_float(engagement.get("bounce rate")),
+            pageviews_per_visitor=_to_float(engagement.get("daily pageviews per visitor")),
+            time_on_site=_to_seconds(engagement.get("daily time on site")),
+            keywords=percents("keywords"),
+            upstreams=percents("upstreams"),
+            sites_linking_in=_to_int(d.get("total sites linking in")),
+            related_sites=d.get("related sites"),
+            category=d.get("category"),
+            subdomains=percents("subdomains"),
+            loadspeed=d.get("loadspeed"),
+            visitor_gender=fractions("visitor gender"),
+            visitor_education=fractions("visitor education"),
+            visitor_location=fractions("visitor location"))
+
+    def to_dict(self):
+        d = {}
+        if self.global_rank is not None or self.local_rank is not None:
+            d["rank"] = {"global": _format_int(self.global_rank), "local": _format_int(self.local_rank)}
+        if self.country is not None: d["country"] = self.country
+        if self.visitors_by_country is not None:
+            d["visitor by country"] = [c.to_dict() for c in self.visitors_by_country]
+        if self.bounce_rate is not None or self.pageviews_per_visitor is not None or self.time_on_site is not None:
+            d["user engagement"] = {"bounce rate": _format_percent(self.bounce_rate),
+                "daily pageviews per visitor": _format_float(self.pageviews_per_visitor),
+                "daily time on site": _format_seconds(self.time_on_site)}
+        for key, value in (("keywords", self.keywords), ("upstreams", self.upstreams)):
+            if value is not None: d[key] = dict((k, _format_percent(v)) for k, v in value.items())
+        if self.sites_linking_in is not None: d["total sites linking in"] = _format_int(self.sites_linking_in)
+        if self.related_sites is not None: d["related sites"] = list(self.related_sites)
+        if self.category is not None: d["category"] = self.category
+        if self.subdomains is not None:
+            d["subdomains"] = dict((k, _format_percent(v)) for k, v in self.subdomains.items())
+        if self.loadspeed is not None: d["loadspeed"] = self.loadspeed
+        for key, value in (("visitor gender", self.visitor_gender), ("visitor education", self.visitor_education),
+                ("visitor location", self.visitor_location)):
+            if value is not None: d[key] = dict((k, str(v)) for k, v in value.items())
+        return d
+
+    def __eq__(self, other):
+        return isinstance(other, SiteInfo) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "SiteInfo(global_rank={0!r}, local_rank={1!r}, country={2!r})".format(
+            self.global_rank, self.local_rank, self.country)
+
+class TopSiteEntry():
+    """
+    One entry of the list returned by `get_topsites_by_category`, with an int `rank`.
+    As for `SiteInfo`, `to_dict()` formats the rank back, so a rank that is not a plain number is not kept.
+    """
+    __slots__ = ("rank", "address", "description")
+
+    def __init__(self, rank, address, description):
+        self.rank = rank
+        self.address = address
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(_to_int(d.get("rank")), d.get("address"), d.get("description"))
+
+    def to_dict(self):
+        d = {}
+        if self.rank is not None: d["rank"] = str(self.rank)
+        if self.address is not None: d["address"] = self.address
+        if self.description is not None: d["description"] = self.description
+        return d
+
+    def __eq__(self, other):
+        return isinstance(other, TopSiteEntry) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "TopSiteEntry({0!r}, {1!r}, {2!r})".format(self.rank, self.address, self.description)
@@ -5,6 +5,9 @@ import hmac
 import hashlib
 import base64
 import requests
+import bulk
+import transport
+import instrument
 
 #Query Options  # refer to AWIS API reference for full details.
 # Action = "UrlInfo" 
@@ -48,7 +51,75 @@ def get_access_url(target_url, access_id, secret_key, action="UrlInfo", response
     signature = create_signature(uri, secret_key)
     return "http://{0}/?{1}&Signature={2}".format(ServiceHost, uri, signature)
 
-def get_site_info(url, access_id, secret_key):
-    return requests.get_access_url(url, access_id, secret_key).text
+@instrument.measured("awis")
+def get_site_info(url, access_id, secret_key, session=None):
+    return transport.get(get_access_url(url, access_id, secret_key), session).text
 
-    
\ No newline at end of file
+    
+
+class AwisClient():
+    """
+    A client for high volumes of AWIS calls made with the credentials `access_id` and `secret_key`.
+    The HMAC keyed with `secret_key` and the static part of the canonical query
+    (every parameter sorted before "Timestamp") are prepared once: signing a request only
+    hashes its timestamp and target url. Requests go through the `transport.Session` `session`,
+    or through a pooled session of the client's own, closed by `close()`.
+    Use it as a context manager, or call `close()` once done.
+    `endpoint` replaces "http://awis.amazonaws.com" in the urls requested, e.g. to call a local stand-in.
+    """
+    def __init__(self, access_id, secret_key, session=None, action="UrlInfo",
+            response_group="Related,TrafficData,ContentData", endpoint=None, max_workers=8):
+        self._owns_session = session is None
+        self.session = session if session is not None else transport.Session(pool_maxsize=max_workers)
+        self.max_workers = max_workers
+        self._endpoint = endpoint if endpoint is not None else "http://" + ServiceHost
+        # The parameters sorted before "Timestamp" and "Url", which create_uri would put first.
+        self._prefix = urlparse.urlencode([
+            ("AWSAccessKeyId", access_id),
+            ("Action", action),
+            ("ResponseGroup", response_group),
+            ("SignatureMethod", SignatureMethod),
+            ("SignatureVersion", SignatureVersion),
+        ]) + "&"
+        self._signer = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+        self._signer.update("\n".join(["GET", ServiceHost, PATH, self._prefix]).encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """
+        Close the pooled session of the client's own; a session given to the client is left open.
+        """
+        if self._owns_session: self.session.close()
+
+    def access_url(self, target_url, timestamp=None):
+        """
+        Return the signed url of the request about `target_url`, stamped with `timestamp`
+        (`create_timestamp()` by default), as `get_access_url` would.
+        """
+        if timestamp is None: timestamp = create_timestamp()
+        dynamic = urlparse.urlencode([("Timestamp", timestamp), ("Url", target_url)])
+        h = self._signer.copy()
+        h.update(dynamic.encode())
+        signature = urlparse.quote(base64.b64encode(h.digest()))
+        return "{0}/?{1}{2}&Signature={3}".format(self._endpoint, self._prefix, dynamic, signature)
+
+    @instrument.measured("awis")
+    def url_info(self, target_url):
+        """
+        Return the AWIS response about `target_url`, as `get_site_info` does.
+        """
+        return transport.get(self.access_url(target_url), self.session).text
+
+    def url_info_many(self, target_urls, max_workers=None):
+        """
+        Call `url_info` for every url of the iterable `target_urls` over the client's session,
+        `max_workers` (by default the client's `max_workers`) at a time,
+        and yield `(target_url, response)` pairs in completion order.
+        `response` is either the response text or the exception raised while fetching it.
+        """
+        return bulk.outcomes(self.url_info, target_urls, max_workers or self.max_workers)
@@ -0,0 +1,155 @@
+"""
+Pluggable HTML tokenizers driving the parsers of `alexa` and `whois`.
+
+The parsers only implement `handle_starttag`, `handle_data` and `handle_endtag`;
+a backend decides what produces those events:
+- "stdlib" tokenizes with `html.parser.HTMLParser`, in pure python.
+- "lxml" tokenizes with libxml2 through **lxml** (https://lxml.de/), which is several times faster.
+The stdlib is the default. lxml is opt-in, with `set_backend("lxml")`, or "auto" to use it when installed:
+libxml2 repairs malformed markup before reporting it (it adds the html, head and body elements,
+closes unclosed p and li elements, renames misnested end tags, reports no end tag for `<br/>` and
+an empty string for attributes without a value), so on such pages the parsers may return different results.
+
+Example
+--------
+```
+import backend
+backend.set_backend("stdlib")
+```
+"""
+
+import time
+import instrument
+
+try:
+    from lxml import etree as _etree
+except ImportError:
+    _etree = None
+
+backends = ("auto", "stdlib", "lxml")
+_backend = "stdlib"
+
+# html.parser reports no end tag for these, unless written as <br/>.
+_void_elements = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "meta", "param", "source", "track", "wbr"])
+
+class ParseComplete(Exception):
+    """
+    Raised by a parser's handlers once it has all it needs, to stop the tokenizer early.
+    """
+    pass
+
+def available_backends():
+    """
+    Return the names of the backends usable in this environment.
+    """
+    if _etree is None: return ["stdlib"]
+    return ["stdlib", "lxml"]
+
+def set_backend(name):
+    """
+    Select the backend used by every parse, one of "stdlib" (the default), "lxml" or "auto"
+    (lxml when it is installed, and the stdlib otherwise).
+    """
+    global _backend
+    if name not in backends: raise ValueError("Unknown parser backend: " + str(name))
+    if name == "lxml" and _etree is None: raise ImportError("The lxml parser backend requires lxml.")
+    _backend = name
+
+def get_backend():
+    """
+    Return the name of the backend actually in use, "stdlib" or "lxml".
+    """
+    if _backend == "auto": return "stdlib" if _etree is None else "lxml"
+    return _backend
+
+class _StdlibFeeder():
+    # The parsers are HTMLParser subclasses themselves: feeding them is enough.
+    def __init__(self, handler):
+        self.handler = handler
+
+    @property
+    def done(self):
+        return getattr(self.handler, "done", False)
+
+    def feed(self, data):
+        self.handler.feed(data)
+
+    def finish(self):
+        pass
+
+class _LxmlTarget():
+    # Turns libxml2 parser events into html.parser style handler calls:
+    # text is joined up to the next tag or comment, as html.parser delivers it,
+    # and end events of void elements are dropped.
+    def __init__(self, handler):
+        self._handler = handler
+        self._text = []
+
+    def _flush(self):
+        if self._text:
+            text = "".join(self._text)
+            self._text = []
+            self._handler.handle_data(text)
+
+    def start(self, tag, attrib):
+        self._flush()
+        self._handler.handle_starttag(tag, list(attrib.items()))
+
+    def end(self, tag):
+        self._flush()
+        if tag not in _void_elements: self._handler.handle_endtag(tag)
+
+    def data(self, data):
+        self._text.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+
+class _LxmlFeeder():
+    def __init__(self, handler):
+        self.handler = handler
+        self._parser = _etree.HTMLParser(target=_LxmlTarget(handler))
+        self._stopped = False
+
+    @property
+    def done(self):
+        return self._stopped or getattr(self.handler, "done", False)
+
+    def feed(self, data):
+        if self._stopped: return
+        try:
+            self._parser.feed(data)
+        except ParseComplete:
+            self._stopped = True
+
+    def finish(self):
+        if self._stopped: return
+        try:
+            self._parser.close()
+        except ParseComplete:
+            pass
+        self._stopped = True
+
+def feeder(handler):
+    """
+    Return an object with `feed(data)` and `finish()` methods, and a `done` property,
+    driving the handler methods of the HTMLParser subclass `handler` with the current backend.
+    """
+    if get_backend() == "lxml": return _LxmlFeeder(handler)
+    return _StdlibFeeder(handler)
+
+def parse(handler, html_data_str):
+    """
+    Feed the whole page `html_data_str` to `handler` with the current backend.
+    """
+    measured = bool(instrument.hooks)
+    if measured: start = time.perf_counter()
+    f = feeder(handler)
+    f.feed(html_data_str)
+    f.finish()
+    if measured: instrument.emit("parse", time.perf_counter() - start)
+    return handler
@@ -0,0 +1,199 @@
+"""
+Parse saved alexa.com siteinfo, alexa.com topsites and whois.com pages offline, in bulk.
+
+Pages can be given as files, directories (searched recursively for .htm/.html files),
+glob patterns, or .tar/.tar.gz/.tgz/.zip archives. They are parsed across a pool of processes
+and the results are streamed out as JSON Lines, one record per page:
+`{"source": ..., "kind": ..., "result": ...}`, or `{"source": ..., "kind": ..., "error": ...}`
+for pages that failed to parse.
+
+Example
+--------
+```
+python batch.py saved_pages/ archive.tar.gz -o parsed.jsonl --processes 8
+```
+or from python:
+```
+import batch
+for record in batch.parse_pages(["saved_pages/"], kind="whois"):
+    print(record["source"], record.get("error"))
+```
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+import alexa
+import whois
+
+kinds = ("siteinfo", "topsites", "whois")
+
+def _detect_kind(name, text):
+    if 'class="whois_result"' in text: return "whois"
+    if 'class="site-listing"' in text or "No sites for this category." in text: return "topsites"
+    if "row-fluid summary" in text: return "siteinfo"
+    lowered = name.lower()
+    for kind in kinds:
+        if kind in lowered: return kind
+    return "siteinfo"
+
+def _parse_topsites(text):
+    try:
+        return {"list": alexa._parse_topsite_page(text)}
+    except IndexError as identifier:
+        if identifier.args[0] != ("NSFTC"): raise identifier
+        return {"list": []}
+
+_parsers = {
+    "siteinfo": alexa.get_website_info_from_str,
+    "topsites": _parse_topsites,
+    "whois": whois.who_is_from_str,
+}
+
+def _is_archive(path):
+    lowered = path.lower()
+    return lowered.endswith((".tar", ".tar.gz", ".tgz", ".zip"))
+
+def _is_page(name):
+    return name.lower().endswith((".htm", ".html"))
+
+def iter_pages(inputs):
+    """
+    Yield `(name, source)` for every page found in the paths, directories, glob patterns and archives `inputs`.
+    `source` is the path of a page on disk, or the bytes of a page read from an archive.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if _is_page(name): yield os.path.join(root, name), os.path.join(root, name)
+        elif os.path.isfile(item) and _is_archive(item):
+            if item.lower().endswith(".zip"):
+                with zipfile.ZipFile(item) as z:
+                    for info in z.infolist():
+                        if not info.is_dir() and _is_page(info.filename):
+                            yield item + "!" + info.filename, z.read(info)
+            else:
+                with tarfile.open(item) as t:
+                    for member in t:
+                        if member.isfile() and _is_page(member.name):
+                            yield item + "!" + member.name, t.extractfile(member).read()
+        elif os.path.isfile(item):
+            yield item, item
+        else:
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path): yield path, path
+
+def _parse_page(name, source, kind):
+    if isinstance(source, bytes):
+        size = len(source)
+        text = source.decode("utf8", "replace")
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+        size = len(data)
+        text = data.decode("utf8", "replace")
+    page_kind = kind or _detect_kind(name, text)
+    record = {"source": name, "kind": page_kind}
+    try:
+        record["result"] = _parsers[page_kind](text)
+    except Exception as e:
+        record["error"] = "{0}: {1}".format(type(e).__name__, e)
+    return record, size
+
+def _parse_chunk(chunk, kind, encode):
+    # Runs in the worker processes; encoding there keeps json.dumps off the collecting process.
+    records = []
+    for name, source in chunk:
+        record, size = _parse_page(name, source, kind)
+        records.append((json.dumps(record) if encode else record, size, "error" in record))
+    return records
+
+def _chunks(pages, chunksize):
+    chunk = []
+    for page in pages:
+        chunk.append(page)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+class Throughput():
+    """
+    Counters of pages, bytes and errors seen since the object was created.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.pages = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def add(self, size, error):
+        self.pages += 1
+        self.bytes += size
+        if error: self.errors += 1
+
+    def __str__(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return "{0} pages ({1} errors) in {2:.1f}s: {3:.1f} pages/s, {4:.2f} MB/s".format(self.pages,
+            self.errors, elapsed, self.pages / elapsed, self.bytes / elapsed / 1e6)
+
+def parse_pages(inputs, kind=None, processes=None, chunksize=16, encode=False, throughput=None):
+    """
+    Parse every page found in `inputs` (see `iter_pages`) over `processes` worker processes,
+    and yield one record per page in completion order.
+    `kind` is one of "siteinfo", "topsites" or "whois"; if None, it is detected for each page.
+    Pages are sent to the workers `chunksize` at a time, and only a bounded number of chunks is
+    in flight, so archives are never loaded whole into memory.
+    With `encode` set, records are yielded as JSON strings encoded by the workers.
+    A `Throughput` given as `throughput` is updated as pages are parsed.
+    """
+    if kind is not None and kind not in kinds: raise ValueError("Unknown page kind: " + str(kind))
+    processes = processes or os.cpu_count() or 1
+    chunks = _chunks(iter_pages(inputs), chunksize)
+    pending = set()
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        while True:
+            for chunk in chunks:
+                pending.add(executor.submit(_parse_chunk, chunk, kind, encode))
+                if len(pending) >= 2 * processes: break
+            if not pending: break
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for record, size, error in future.result():
+                    if throughput is not None: throughput.add(size, error)
+                    yield record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse saved alexa.com and whois.com pages into JSON Lines.")
+    parser.add_argument("inputs", nargs="+", help="page files, directories, glob patterns or .tar/.zip archives")
+    parser.add_argument("-o", "--output", help="output .jsonl file (default: standard output)")
+    parser.add_argument("--kind", choices=kinds, help="kind of every page (default: detected per page)")
+    parser.add_argument("--processes", type=int, help="number of parser processes (default: one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=16, help="pages sent to a worker at a time")
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between throughput reports")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output is None else open(args.output, 'w', encoding="utf8")
+    throughput = Throughput()
+    last_report = time.perf_counter()
+    try:
+        for line in parse_pages(args.inputs, args.kind, args.processes, args.chunksize, True, throughput):
+            out.write(line)
+            out.write("\n")
+            if time.perf_counter() - last_report >= args.report_every:
+                last_report = time.perf_counter()
+                print(throughput, file=sys.stderr)
+    finally:
+        if out is not sys.stdout: out.close()
+    print(throughput, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
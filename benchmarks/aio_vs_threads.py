@@ -0,0 +1,130 @@
+"""
+Benchmark the siteinfo lookups of `aio.Client` against the threaded `alexa.get_website_info`.
+
+`--lookups` lookups of the saved siteinfo pages are made against `stub_server`, `--concurrency` at a time:
+- threads: `alexa.get_website_info` over a thread pool, one `transport` session;
+- aio, parse on loop: `aio.Client` parsing every page on the event loop itself;
+- aio, parse in threads: `aio.Client` parsing on the loop's default thread pool, as it does by default;
+- aio, parse in processes: `aio.Client` parsing on a pool of `--processes` processes.
+Reported: lookups per second, the median and 90th percentile latency of a lookup,
+and for the aio runs the worst lag of the event loop, i.e. how late a 1 ms timer fired:
+while a page is parsed on the loop, no other response is read.
+
+Results
+--------
+Python 3.11.7, 1 CPU, options by default (runs vary by about 10%):
+```
+client                        lookups/s    median ms       p90 ms    loop lag ms
+threads                           148.1       102.18       166.90              -
+aio, parse on loop                156.3        82.08       134.92         192.33
+aio, parse in threads             145.7        87.65       124.96          69.01
+aio, parse in processes           137.8       105.57       160.41          12.17
+```
+Parsing is the bottleneck, so every client makes about as many lookups per second on one core.
+Off the loop, parsing no longer stalls it for a whole batch of pages: the worst lag falls about threefold
+in threads, which still contend with the loop for the GIL, and about fifteenfold in processes,
+which cost the most throughput here for sending the pages over.
+With several cores, the process pool would also parse pages in parallel; that is not measured here.
+
+Usage
+--------
+python benchmarks/aio_vs_threads.py [--lookups N] [--concurrency N] [--processes N] [--delay SECONDS]
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import aio
+import alexa
+import transport
+
+class _ParseOnLoop(aio.Client):
+    async def _parse(self, parse, *args):
+        return parse(*args)
+
+def _timed(lookup, site):
+    start = time.perf_counter()
+    try:
+        lookup(site)
+    except ValueError:
+        pass
+    return time.perf_counter() - start
+
+def _threads(items, concurrency):
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(lambda site: _timed(alexa.get_website_info, site), items)), None
+
+async def _aio(client_class, items, concurrency, executor=None):
+    lag = [0.0]
+    async def watch():
+        # How late a 1 ms sleep wakes up: the time the loop spent unable to serve anything else.
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag[0] = max(lag[0], time.perf_counter() - start - 0.001)
+    async with client_class(max_concurrency=concurrency, executor=executor) as client:
+        sites = iter(items)
+        latencies = []
+        async def worker():
+            # `concurrency` workers take the sites one after another, as the threads of a pool do.
+            for site in sites:
+                start = time.perf_counter()
+                try:
+                    await client.get_website_info(site)
+                except ValueError:
+                    pass
+                latencies.append(time.perf_counter() - start)
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+        finally:
+            watcher.cancel()
+    return latencies, lag[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=400, help="lookups per run")
+    parser.add_argument("--concurrency", type=int, default=16, help="lookups in flight at once")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="processes parsing for the aio client")
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stub waits before each response")
+    args = parser.parse_args(argv)
+
+    sites = sorted(os.path.basename(page)[:-5]
+        for page in glob.glob(os.path.join(stub_server._fixtures_dir, "siteinfo", "*.html")))
+    items = [sites[i % len(sites)] for i in range(args.lookups)]
+
+    transport.configure(pool_maxsize=args.concurrency)
+    processes = concurrent.futures.ProcessPoolExecutor(args.processes)
+    with stub_server.StubServer(delay=args.delay) as server:
+        restore = stub_server.redirect(server.base_url)
+        try:
+            runs = [
+                ("threads", lambda: _threads(items, args.concurrency)),
+                ("aio, parse on loop", lambda: asyncio.run(_aio(_ParseOnLoop, items, args.concurrency))),
+                ("aio, parse in threads", lambda: asyncio.run(_aio(aio.Client, items, args.concurrency))),
+                ("aio, parse in processes", lambda: asyncio.run(_aio(aio.Client, items, args.concurrency, processes))),
+            ]
+            print("{0:<26} {1:>12} {2:>12} {3:>12} {4:>14}".format("client", "lookups/s", "median ms", "p90 ms",
+                "loop lag ms"))
+            for name, run in runs:
+                start = time.perf_counter()
+                latencies, lag = run()
+                elapsed = time.perf_counter() - start
+                latencies.sort()
+                print("{0:<26} {1:>12.1f} {2:>12.2f} {3:>12.2f} {4:>14}".format(name, args.lookups / elapsed,
+                    statistics.median(latencies) * 1000, latencies[int(0.9 * (len(latencies) - 1))] * 1000,
+                    "-" if lag is None else "{0:.2f}".format(lag * 1000)))
+        finally:
+            restore()
+            processes.shutdown()
+
+if __name__ == "__main__":
+    main()
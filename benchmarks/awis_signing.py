@@ -0,0 +1,79 @@
+"""
+Benchmark the signing and dispatch of AWIS requests: module functions against `awis_via_auth.AwisClient`.
+
+Signing: urls signed per second by `get_access_url`, which rebuilds, sorts and encodes every parameter
+and keys a new HMAC per call, and by `AwisClient.access_url`; both must give the same url.
+Dispatch: `UrlInfo` calls per second against the AWIS stand-in of `stub_server`,
+made one by one with `get_site_info`, then concurrently with `AwisClient.url_info_many`.
+
+Usage
+--------
+python benchmarks/awis_signing.py [--signs N] [--calls N] [--workers N] [--delay SECONDS]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import awis_via_auth
+
+_access_id = "AKIDEXAMPLE"
+_secret_key = "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--signs", type=int, default=50000, help="urls signed per signer")
+    parser.add_argument("--calls", type=int, default=200, help="UrlInfo calls per dispatcher")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent calls of url_info_many")
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stand-in waits before each response")
+    args = parser.parse_args(argv)
+
+    targets = ["site{0}.example.com/".format(i) for i in range(args.signs)]
+    timestamp = awis_via_auth.create_timestamp()
+    client = awis_via_auth.AwisClient(_access_id, _secret_key)
+    client.close()
+    create_timestamp = awis_via_auth.create_timestamp
+    awis_via_auth.create_timestamp = lambda: timestamp
+    try:
+        for target in targets[:100]:
+            if awis_via_auth.get_access_url(target, _access_id, _secret_key) != client.access_url(target):
+                raise AssertionError("AwisClient signs {0} differently".format(target))
+        signers = [
+            ("get_access_url", lambda target: awis_via_auth.get_access_url(target, _access_id, _secret_key)),
+            ("AwisClient.access_url", client.access_url),
+        ]
+        print("{0:<28} {1:>12} {2:>12}".format("signer", "urls/s", "us/url"))
+        for name, sign in signers:
+            start = time.perf_counter()
+            for target in targets: sign(target)
+            elapsed = time.perf_counter() - start
+            print("{0:<28} {1:>12.0f} {2:>12.2f}".format(name, len(targets) / elapsed, elapsed / len(targets) * 1e6))
+    finally:
+        awis_via_auth.create_timestamp = create_timestamp
+
+    targets = targets[:args.calls]
+    with stub_server.StubServer(delay=args.delay) as server, \
+            awis_via_auth.AwisClient(_access_id, _secret_key, endpoint=server.base_url, max_workers=args.workers) as client:
+        service_host = awis_via_auth.ServiceHost
+        awis_via_auth.ServiceHost = server.base_url[len("http://"):]
+        try:
+            dispatchers = [
+                ("get_site_info, serial", lambda: [awis_via_auth.get_site_info(t, _access_id, _secret_key) for t in targets]),
+                ("AwisClient.url_info_many", lambda: [r for t, r in client.url_info_many(targets)]),
+            ]
+            print("{0:<28} {1:>12}".format("dispatcher", "calls/s"))
+            for name, dispatch in dispatchers:
+                start = time.perf_counter()
+                responses = dispatch()
+                elapsed = time.perf_counter() - start
+                failed = [r for r in responses if not isinstance(r, str) or "Success" not in r]
+                if failed: raise AssertionError("{0}: {1} failed calls".format(name, len(failed)))
+                print("{0:<28} {1:>12.1f}".format(name, len(targets) / elapsed))
+        finally:
+            awis_via_auth.ServiceHost = service_host
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Throughput benchmark of the parser backends in module `backend`.
+
+Every saved siteinfo, topsites and whois page of the corpus is parsed with each available backend,
+and pages per second and MB per second are reported for each backend and page kind.
+Pages on which a backend returns results different from the "stdlib" one are counted:
+the well-formed pages of the corpus say little about conformance, which tests/test_backend.py
+checks on malformed markup.
+
+Usage
+--------
+python benchmarks/parser_backends.py [fixtures_dir] [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import alexa
+import backend
+import whois
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def _parse_topsites(text):
+    try:
+        return alexa._parse_topsite_page(text)
+    except IndexError as identifier:
+        return identifier.args
+
+kinds = [
+    ("siteinfo", alexa.get_website_info_from_str),
+    ("topsites", _parse_topsites),
+    ("whois", whois.who_is_from_str),
+]
+
+def _result(parse, text):
+    try:
+        return parse(text)
+    except ValueError as e:
+        return repr(e)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures", nargs="?", default=_fixtures_dir,
+        help="directory holding siteinfo/, topsites/ and whois/ page directories")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus per backend")
+    args = parser.parse_args(argv)
+
+    corpus = []
+    for kind, parse in kinds:
+        pages = sorted(glob.glob(os.path.join(args.fixtures, kind, "**", "*.html"), recursive=True))
+        texts = []
+        for page in pages:
+            with open(page, encoding="utf8") as f: texts.append(f.read())
+        corpus.append((kind, parse, pages, texts))
+
+    selected = backend._backend
+    try:
+        backend.set_backend("stdlib")
+        expected = [[_result(parse, text) for text in texts] for kind, parse, pages, texts in corpus]
+        for name in backend.available_backends():
+            backend.set_backend(name)
+            differing = sum(_result(parse, text) != result for (kind, parse, pages, texts), results in zip(corpus, expected)
+                for text, result in zip(texts, results))
+            print("{0}: results differing from stdlib on {1} of {2} pages".format(name, differing,
+                sum(len(pages) for kind, parse, pages, texts in corpus)))
+
+        print("{0:<10} {1:<10} {2:>10} {3:>10}".format("backend", "pages", "pages/s", "MB/s"))
+        for name in backend.available_backends():
+            backend.set_backend(name)
+            for kind, parse, pages, texts in corpus:
+                if len(texts) == 0: continue
+                size = sum(len(text.encode()) for text in texts)
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    for text in texts: _result(parse, text)
+                elapsed = time.perf_counter() - start
+                print("{0:<10} {1:<10} {2:>10.1f} {3:>10.2f}".format(name, kind,
+                    args.repeat * len(texts) / elapsed, args.repeat * size / elapsed / 1e6))
+    finally:
+        backend.set_backend(selected)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark `pipeline.Pipeline` against the thread-only bulk lookups, as the number of parser processes grows.
+
+`--lookups` whois and siteinfo lookups are made against `stub_server`, run in a process of its own
+so that serving pages does not compete with the client for the GIL:
+- "threads": `whois.who_is_many`, and `alexa.get_website_info` over a pool of threads;
+- "pipeline processes=N": a `Pipeline` with `--workers` fetch threads and N parser processes.
+Reports lookups per second and the speedup over the threads.
+
+Results
+--------
+Python 3.11.7, 1 CPU, `--levels 1,2,4`, other options by default (runs vary by about 10%):
+```
+kind       configuration               lookups/s    speedup
+whois      threads                         129.6      1.00x
+whois      pipeline processes=1            116.3      0.90x
+whois      pipeline processes=2            108.5      0.84x
+whois      pipeline processes=4            127.4      0.98x
+siteinfo   threads                         111.3      1.00x
+siteinfo   pipeline processes=1            100.7      0.90x
+siteinfo   pipeline processes=2             87.8      0.79x
+siteinfo   pipeline processes=4             84.9      0.76x
+```
+Measured scaling: none. With a single core, more processes only take turns with the fetch threads,
+and sending the pages to them costs 10 to 25% of the throughput. The scaling with the cores
+has not been measured on a machine with several; until it is, use the threads on small machines.
+
+Usage
+--------
+python benchmarks/pipeline_scaling.py [--lookups N] [--workers N] [--levels 1,2,4] [--delay SECONDS]
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import alexa
+import pipeline
+import transport
+import whois
+
+def _serve(delay, ports):
+    server = stub_server.StubServer(delay=delay)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+def _names(kind):
+    pages = glob.glob(os.path.join(stub_server._fixtures_dir, kind, "*.html"))
+    return sorted(os.path.basename(p)[:-5] for p in pages)
+
+def _quiet(function, *args, **kwargs):
+    # "Not found" lookups are part of the workload.
+    try:
+        return function(*args, **kwargs)
+    except ValueError:
+        return None
+
+def _threads(kind, items, workers):
+    if kind == "whois": return list(whois.who_is_many(items, max_workers=workers))
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda site: _quiet(alexa.get_website_info, site), items))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=400, help="lookups per kind and configuration")
+    parser.add_argument("--workers", type=int, default=16, help="fetch threads")
+    parser.add_argument("--levels", default=None, help="comma-separated parser process counts (default: 1, 2, 4... up to the CPUs)")
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stub waits before each response")
+    args = parser.parse_args(argv)
+    if args.levels is None:
+        levels = [1]
+        while levels[-1] * 2 <= (os.cpu_count() or 1): levels.append(levels[-1] * 2)
+    else:
+        levels = [int(level) for level in args.levels.split(",")]
+
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args.delay, ports), daemon=True)
+    server.start()
+    restore = stub_server.redirect("http://127.0.0.1:{0}".format(ports.get()))
+    transport.configure(pool_maxsize=args.workers)
+    try:
+        print("{0} CPUs".format(os.cpu_count()))
+        print("{0:<10} {1:<24} {2:>12} {3:>10}".format("kind", "configuration", "lookups/s", "speedup"))
+        for kind in pipeline.kinds:
+            names = _names(kind)
+            items = [names[i % len(names)] for i in range(args.lookups)]
+            runs = [("threads", lambda: _threads(kind, items, args.workers))]
+            for processes in levels:
+                p = pipeline.Pipeline(kind, fetch_workers=args.workers, processes=processes)
+                runs.append(("pipeline processes={0}".format(processes), lambda p=p: list(p.run(items))))
+            base = None
+            for name, run in runs:
+                start = time.perf_counter()
+                run()
+                rate = len(items) / (time.perf_counter() - start)
+                if base is None: base = rate
+                print("{0:<10} {1:<24} {2:>12.1f} {3:>9.2f}x".format(kind, name, rate, rate / base))
+    finally:
+        restore()
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark `refresh.Refresh` on an unchanged work list, against refetching every page.
+
+Against `stub_server`, for the whois and siteinfo pages:
+- "refetch": every page fetched and parsed again, with `whois.who_is` or `alexa.get_website_info`;
+- "304": pages revalidated with their ETag, the stub answering 304 Not Modified;
+- "hash match": the stub sending no validators, pages downloaded but not parsed as their digest matches.
+Reports lookups per second, the pages whose parsing was skipped and the KiB downloaded and saved.
+
+Usage
+--------
+python benchmarks/refresh_revalidation.py [--lookups N] [--workers N] [--delay SECONDS]
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import alexa
+import cache
+import instrument
+import refresh
+import transport
+import whois
+
+_lookups = {"whois": (whois.who_is, "whois"), "siteinfo": (alexa.get_website_info, "alexa.siteinfo")}
+
+def _names(kind):
+    pages = glob.glob(os.path.join(stub_server._fixtures_dir, kind, "*.html"))
+    return sorted(os.path.basename(p)[:-5] for p in pages)
+
+def _refetch(kind, work, workers):
+    # Return the bytes downloaded.
+    lookup, call = _lookups[kind]
+    def quiet(item):
+        try:
+            lookup(item)
+        except ValueError:
+            pass
+    collector = instrument.Collector()
+    instrument.add_hook(collector)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            list(executor.map(quiet, work))
+    finally:
+        instrument.remove_hook(collector)
+    return collector.summary()[call]["bytes"]["sum"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=400, help="lookups per kind and run")
+    parser.add_argument("--workers", type=int, default=8, help="fetch threads")
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stub waits before each response")
+    args = parser.parse_args(argv)
+
+    transport.configure(pool_maxsize=args.workers)
+    directory = tempfile.mkdtemp()
+    try:
+        print("{0:<10} {1:<12} {2:>12} {3:>10} {4:>12} {5:>12}".format("kind", "run", "lookups/s", "skipped",
+            "KiB read", "KiB saved"))
+        for kind in refresh.kinds:
+            names = _names(kind)
+            work = [names[i % len(names)] for i in range(args.lookups)]
+            with stub_server.StubServer(delay=args.delay) as server:
+                restore = stub_server.redirect(server.base_url)
+                try:
+                    start = time.perf_counter()
+                    read = _refetch(kind, work, args.workers)
+                    rate = len(work) / (time.perf_counter() - start)
+                finally:
+                    restore()
+            print("{0:<10} {1:<12} {2:>12.1f} {3:>10} {4:>12.1f} {5:>12.1f}".format(kind, "refetch", rate, 0,
+                read / 1024, 0))
+            for name, validators in (("304", True), ("hash match", False)):
+                c = cache.DiskCache(os.path.join(directory, "{0}-{1}.sqlite".format(kind, name.replace(" ", "-"))))
+                with stub_server.StubServer(delay=args.delay, validators=validators) as server:
+                    restore = stub_server.redirect(server.base_url)
+                    try:
+                        list(refresh.Refresh(kind, c, max_workers=args.workers).run(names))
+                        r = refresh.Refresh(kind, c, max_workers=args.workers)
+                        start = time.perf_counter()
+                        list(r.run(work))
+                        rate = len(work) / (time.perf_counter() - start)
+                    finally:
+                        restore()
+                c.close()
+                stats = r.stats()
+                print("{0:<10} {1:<12} {2:>12.1f} {3:>10} {4:>12.1f} {5:>12.1f}".format(kind, name, rate,
+                    stats["skipped"], stats["bytes downloaded"] / 1024, stats["bytes saved"] / 1024))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare the json structures returned by `alexa.get_website_info` with `alexa.SiteInfo` records.
+
+Each saved siteinfo page is parsed once, then copied into `--records` results of each form.
+The memory traced by `tracemalloc` per record is reported, with the time taken by a typical
+aggregation over all records: the mean bounce rate, and the visitor share summed per country.
+
+Usage
+--------
+python benchmarks/result_types.py [corpus_dir] [--records N]
+"""
+
+import argparse
+import copy
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import alexa
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "siteinfo")
+
+def _aggregate_dicts(records):
+    bounce, shares = 0.0, {}
+    for r in records:
+        bounce += float(r["user engagement"]["bounce rate"].rstrip("%"))
+        for c in r["visitor by country"]:
+            shares[c["country"]] = shares.get(c["country"], 0.0) + float(c["percentage"].rstrip("%"))
+    return bounce / len(records), shares
+
+def _aggregate_records(records):
+    bounce, shares = 0.0, {}
+    for r in records:
+        bounce += r.bounce_rate
+        for c in r.visitors_by_country:
+            shares[c.country] = shares.get(c.country, 0.0) + c.percentage
+    return bounce / len(records), shares
+
+def _build(make, results, count):
+    # The records are copies, as parsing would give them, and are kept alive until measured.
+    tracemalloc.start()
+    records = [make(results[i % len(results)]) for i in range(count)]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, current
+
+forms = [
+    ("dict", copy.deepcopy, _aggregate_dicts),
+    ("SiteInfo", alexa.SiteInfo.from_dict, _aggregate_records),
+]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=_fixtures_dir, help="directory of saved siteinfo pages")
+    parser.add_argument("--records", type=int, default=20000, help="records built of each form")
+    args = parser.parse_args(argv)
+
+    results = []
+    for page in sorted(glob.glob(os.path.join(args.corpus, "*.html"))):
+        with open(page, encoding="utf8") as f:
+            try:
+                results.append(alexa.get_website_info_from_str(f.read()))
+            except ValueError:
+                pass
+    if len(results) == 0: parser.error("no parsable siteinfo pages in " + args.corpus)
+    for result in results:
+        # The typed view is lossy (see `alexa.SiteInfo`), but stable once normalized.
+        info = alexa.SiteInfo.from_dict(result)
+        if alexa.SiteInfo.from_dict(info.to_dict()) != info or info.to_dict().keys() != result.keys():
+            raise AssertionError("SiteInfo does not round trip " + str(result.get("rank")))
+
+    print("{0:<10} {1:>14} {2:>16}".format("form", "bytes/record", "aggregate ms"))
+    expected = None
+    for name, make, aggregate in forms:
+        records, size = _build(make, results, args.records)
+        start = time.perf_counter()
+        bounce, shares = aggregate(records)
+        elapsed = time.perf_counter() - start
+        summary = (round(bounce, 6), sorted((k, round(v, 6)) for k, v in shares.items()))
+        if expected is None: expected = summary
+        elif summary != expected: raise AssertionError(name + " aggregates differently")
+        print("{0:<10} {1:>14.0f} {2:>16.2f}".format(name, size / args.records, elapsed * 1000))
+        del records
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Run a sharded crawl with `sharding` over several worker processes on this host, against `stub_server`.
+
+`--items` domains are split into one shard per worker and looked up with `whois.who_is`.
+With `--kill`, the first worker is killed after `--kill-after` seconds: its leased items
+are taken over by the others once their `--lease` expires.
+Reports the throughput, the item counts of the queue, and the records left after merging the outputs,
+which should equal the number of items.
+
+Usage
+--------
+python benchmarks/sharded_crawl.py [--workers N] [--items N] [--delay SECONDS] [--lease SECONDS] [--kill]
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import sharding
+import transport
+
+def _serve(delay, ports):
+    server = stub_server.StubServer(delay=delay)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+def _work(base_url, path, shard, output, lease, threads):
+    stub_server.redirect(base_url)
+    transport.configure(pool_maxsize=threads)
+    with sharding.SQLiteWorkQueue(path) as queue:
+        worker = sharding.Worker(queue, "whois", "whois", shard, output, batch_size=16, lease_seconds=lease,
+            max_workers=threads, poll_interval=0.2)
+        for _ in worker.run(): pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="worker processes, one shard each")
+    parser.add_argument("--items", type=int, default=2000, help="domains to look up")
+    parser.add_argument("--threads", type=int, default=8, help="lookup threads per worker")
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stub waits before each response")
+    parser.add_argument("--lease", type=float, default=3.0, help="lease duration in seconds")
+    parser.add_argument("--kill", action="store_true", help="kill the first worker while it works")
+    parser.add_argument("--kill-after", type=float, default=1.0, help="seconds before the worker is killed")
+    args = parser.parse_args(argv)
+
+    names = [os.path.basename(p)[:-5] for p in glob.glob(os.path.join(stub_server._fixtures_dir, "whois", "*.html"))]
+    # Unknown domains are served the "not found" page, which is parsed as well.
+    items = names + ["domain{0}.example".format(i) for i in range(args.items - len(names))]
+    directory = tempfile.mkdtemp()
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args.delay, ports), daemon=True)
+    server.start()
+    base_url = "http://127.0.0.1:{0}".format(ports.get())
+    try:
+        path = os.path.join(directory, "queue.sqlite")
+        with sharding.SQLiteWorkQueue(path) as queue:
+            sharding.enqueue(queue, "whois", items, args.workers)
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=_work, args=(base_url, path, shard,
+            os.path.join(directory, "whois-{0}.jsonl".format(shard)), args.lease, args.threads))
+            for shard in range(args.workers)]
+        for w in workers: w.start()
+        if args.kill:
+            time.sleep(args.kill_after)
+            workers[0].kill()
+            print("killed worker 0")
+        for w in workers: w.join()
+        elapsed = time.perf_counter() - start
+        with sharding.SQLiteWorkQueue(path) as queue:
+            counts = queue.counts("whois")
+        merged = sharding.merge(sorted(glob.glob(os.path.join(directory, "whois-*.jsonl"))),
+            os.path.join(directory, "whois.jsonl"))
+        print("{0} workers: {1} items in {2:.1f}s, {3:.1f} items/s".format(args.workers, len(items), elapsed,
+            len(items) / elapsed))
+        print("queue: {0}".format(counts))
+        print("merged records: {0} (of {1} items)".format(merged, len(items)))
+    finally:
+        server.terminate()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the alexa.com siteinfo parsers on a corpus of saved pages.
+
+Compares the chain of per-section parser objects (`alexa._AlexaSiteInfoHTMLParser`) with the
+table-driven parser (`alexa._AlexaSiteInfoTableParser`), both fresh per page and reused
+through `reset()`. Every engine must give the same result as the chain;
+pages per second and the memory traced by `tracemalloc` per page are reported.
+
+Usage
+--------
+python benchmarks/siteinfo_parser.py [corpus_dir] [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import alexa
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "siteinfo")
+
+def _chain(text):
+    p = alexa._AlexaSiteInfoHTMLParser()
+    p.feed(text)
+    return p._parsed_data
+
+def _table(text):
+    p = alexa._AlexaSiteInfoTableParser()
+    p.feed(text)
+    return p._parsed_data
+
+def _reused_table():
+    p = alexa._AlexaSiteInfoTableParser()
+    def parse(text):
+        p.reset()
+        p.feed(text)
+        return p._parsed_data
+    return parse
+
+engines = [
+    ("chain", lambda: _chain),
+    ("table", lambda: _table),
+    ("table, reused", _reused_table),
+]
+
+def _pages_per_second(parse, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts: parse(text)
+    return repeat * len(texts) / (time.perf_counter() - start)
+
+def _memory_per_page(parse, texts):
+    # Peak and retained bytes traced while parsing each page once, averaged over the corpus.
+    peak = retained = 0
+    for text in texts:
+        tracemalloc.start()
+        result = parse(text)
+        current, page_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak += page_peak
+        retained += current
+        del result
+    return peak / len(texts), retained / len(texts)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=_fixtures_dir, help="directory of saved siteinfo pages")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus per engine")
+    args = parser.parse_args(argv)
+
+    pages = sorted(glob.glob(os.path.join(args.corpus, "*.html")))
+    if len(pages) == 0: parser.error("no .html pages in " + args.corpus)
+    texts = []
+    for page in pages:
+        with open(page, encoding="utf8") as f: texts.append(f.read())
+
+    expected = [_chain(text) for text in texts]
+    print("{0:<16} {1:>12} {2:>14} {3:>16}".format("engine", "pages/s", "peak KiB/page", "retained KiB/page"))
+    for name, make in engines:
+        parse = make()
+        for page, text, result in zip(pages, texts, expected):
+            if parse(text) != result: raise AssertionError(name + " parser disagrees with the chain on " + page)
+        rate = _pages_per_second(parse, texts, args.repeat)
+        peak, retained = _memory_per_page(parse, texts)
+        print("{0:<16} {1:>12.1f} {2:>14.1f} {3:>16.1f}".format(name, rate, peak / 1024, retained / 1024))
+
+if __name__ == "__main__":
+    main()
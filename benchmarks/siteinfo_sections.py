@@ -0,0 +1,113 @@
+"""
+Benchmark `alexa.get_website_info` with and without `sections`.
+
+The saved pages are served with `--section-gap` bytes of markup before each section after the rank block,
+as the sections of the real pages are spread over the page rather than packed within a few KB
+(see `stub_server.spread_sections`), and sent at `--bandwidth` bytes per second.
+
+Parsing: pages per second, CPU microseconds and KiB tokenized per page of `get_website_info_from_str`
+on those pages, for the whole page and for selected sections.
+At scale: `--lookups` streamed lookups through `--workers` threads against `stub_server`,
+reporting the throughput, the median latency, and the KiB read from the network and parsed per lookup
+for each selection. Reads go by chunks of 16 KB, so a selection only reads less when its sections
+end at least a chunk before the others.
+
+Usage
+--------
+python benchmarks/siteinfo_sections.py [--repeat N] [--lookups N] [--workers N] [--delay SECONDS]
+                                       [--section-gap BYTES] [--bandwidth BYTES]
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import alexa
+import instrument
+import transport
+
+selections = [
+    ("all sections", None),
+    ("rank", ["rank"]),
+    ("visitor by country", ["visitor by country"]),
+]
+
+def _parse(text, sections):
+    try:
+        return alexa.get_website_info_from_str(text, sections)
+    except ValueError:
+        return None
+
+def _parsed_bytes(text, sections):
+    # The bytes tokenized before the parser stops, up to the tag completing the last selected section.
+    p = alexa._AlexaSiteInfoTableParser(sections)
+    p.feed(text)
+    p.close()
+    line, column = p.getpos()
+    return len("".join(text.splitlines(True)[:line - 1]).encode("utf8")) + column
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50, help="passes over the saved pages per selection")
+    parser.add_argument("--lookups", type=int, default=400, help="lookups per selection against the stub")
+    parser.add_argument("--workers", type=int, default=8, help="threads making the lookups")
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stub waits before each response")
+    parser.add_argument("--section-gap", type=int, default=32 * 1024, help="bytes of markup between the sections")
+    parser.add_argument("--bandwidth", type=float, default=8e6, help="bytes per second of each response")
+    args = parser.parse_args(argv)
+
+    texts = {}
+    for page in sorted(glob.glob(os.path.join(stub_server._fixtures_dir, "siteinfo", "*.html"))):
+        with open(page, "rb") as f:
+            texts[os.path.basename(page)[:-5]] = stub_server.spread_sections(f.read(), args.section_gap).decode("utf8")
+    sites = sorted(texts)
+    items = [sites[i % len(sites)] for i in range(args.lookups)]
+
+    print("{0:<22} {1:>12} {2:>14} {3:>14}".format("parsing", "pages/s", "CPU us/page", "KiB parsed"))
+    for name, sections in selections:
+        start, cpu = time.perf_counter(), time.process_time()
+        for _ in range(args.repeat):
+            for text in texts.values(): _parse(text, sections)
+        pages = args.repeat * len(texts)
+        parsed = sum(_parsed_bytes(text, sections) for text in texts.values()) / len(texts)
+        print("{0:<22} {1:>12.1f} {2:>14.1f} {3:>14.1f}".format(name, pages / (time.perf_counter() - start),
+            (time.process_time() - cpu) / pages * 1e6, parsed / 1024))
+
+    transport.configure(pool_maxsize=args.workers)
+    collector = instrument.Collector()
+    with stub_server.StubServer(delay=args.delay, bandwidth=args.bandwidth, section_gap=args.section_gap) as server:
+        restore = stub_server.redirect(server.base_url)
+        try:
+            print("{0:<22} {1:>12} {2:>14} {3:>14} {4:>14}".format("lookups", "lookups/s", "median ms",
+                "KiB read", "KiB parsed"))
+            for name, sections in selections:
+                parsed = dict((site, _parsed_bytes(texts[site], sections)) for site in sites)
+                def lookup(site):
+                    start = time.perf_counter()
+                    try:
+                        alexa.get_website_info(site, stream=True, sections=sections)
+                    except ValueError:
+                        pass
+                    return time.perf_counter() - start
+                collector.reset()
+                instrument.add_hook(collector)
+                start = time.perf_counter()
+                with concurrent.futures.ThreadPoolExecutor(args.workers) as executor:
+                    latencies = list(executor.map(lookup, items))
+                elapsed = time.perf_counter() - start
+                instrument.remove_hook(collector)
+                # Both per lookup.
+                read = collector.summary()["alexa.siteinfo"]["bytes"]["sum"] / args.lookups
+                print("{0:<22} {1:>12.1f} {2:>14.2f} {3:>14.1f} {4:>14.1f}".format(name, args.lookups / elapsed,
+                    statistics.median(latencies) * 1000, read / 1024, sum(parsed[site] for site in items) / args.lookups / 1024))
+        finally:
+            restore()
+
+if __name__ == "__main__":
+    main()
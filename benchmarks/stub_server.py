@@ -0,0 +1,203 @@
+"""
+A local HTTP stub replaying the saved pages of `benchmarks/fixtures` in place of alexa.com and whois.com.
+
+- /siteinfo/<domain> serves fixtures/siteinfo/<domain>.html, or notfound.invalid.html;
+- /topsites/category[;<page>]/Top/<category> serves fixtures/topsites/<category>/<page>.html,
+  or the last page of the category (the empty one) past its end;
+- /whois/<domain> serves fixtures/whois/<domain>.html, or notfound.invalid.html;
+- /?Action=<action>&... stands for the AWIS endpoint, and serves fixtures/awis/<action>.xml.
+Each response is delayed by `delay` seconds, to stand for the network round trip, and its body can be
+sent at `bandwidth` bytes per second. The saved siteinfo pages hold their sections within a few KB;
+with `section_gap` set, about that many bytes of markup are added before each section after the rank block,
+standing for the scripts and panels separating them on the real pages (the parsed results are the same).
+Pages are sent with an ETag, and a request whose If-None-Match matches it gets a 304 Not Modified,
+unless the stub is started with `validators` False.
+
+Usage
+--------
+python benchmarks/stub_server.py [--port N] [--delay SECONDS] [--bandwidth BYTES] [--section-gap BYTES]
+"""
+
+import argparse
+import glob
+import http.server
+import os
+import re
+import sys
+import threading
+import urllib.parse as urlparse
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import alexa
+import whois
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+_topsite_path = re.compile(r"^/topsites/category(?:;(\d+))?/Top/(.+)$")
+# The blocks of a siteinfo page after the rank summary, and the markup put before them with `section_gap`.
+_section_start = re.compile(rb'^(?:<section |<div class="row-fluid(?! summary))', re.M)
+_filler = ('<div class="ad-slot"><script type="text/javascript">\n' + "".join(
+    'window.ad_cfg_{0} = {{"slot": "<div class=\\"ad\\">{0}</div>", "w": {0}}};\n'.format(i) for i in range(12)) +
+    '</script></div>\n').encode("utf8")
+_send_chunk_size = 16 * 1024
+
+def spread_sections(page, gap):
+    """
+    Return the siteinfo page `page` (bytes) with about `gap` bytes of markup added before each section
+    but the first, which the parsers skip.
+    """
+    filler = _filler * (gap // len(_filler))
+    return _section_start.sub(lambda m: filler + m.group(0), page)
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are sent separately: with Nagle's algorithm the body would wait for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.delay: self.server.wait(self.server.delay)
+        page = self.server.page(self.path if self.path.startswith("/?") else urlparse.unquote(self.path))
+        if page is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = None
+        if self.server.validators:
+            etag = '"{0:08x}"'.format(zlib.crc32(page))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+        self.send_response(200)
+        if etag is not None: self.send_header("ETag", etag)
+        content_type = "text/xml" if self.path.startswith("/?") else "text/html"
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        if not self.server.bandwidth:
+            self.wfile.write(page)
+            return
+        for i in range(0, len(page), _send_chunk_size):
+            chunk = page[i:i + _send_chunk_size]
+            self.wfile.write(chunk)
+            self.server.wait(len(chunk) / self.server.bandwidth)
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """
+    The stub, listening on 127.0.0.1:`port` (0 picks a free port) and serving the pages under `fixtures_dir`.
+    Pages are read once and kept in memory. Use it as a context manager, or call `start()` and `stop()`.
+    With `validators` False, pages are sent without an ETag and conditional requests are ignored.
+    `bandwidth` (bytes per second of each response) and `section_gap` are described above.
+    """
+    daemon_threads = True
+
+    def __init__(self, fixtures_dir=_fixtures_dir, delay=0.0, port=0, validators=True, bandwidth=None, section_gap=0):
+        http.server.ThreadingHTTPServer.__init__(self, ("127.0.0.1", port), _Handler)
+        self.fixtures_dir = fixtures_dir
+        self.delay = delay
+        self.validators = validators
+        self.bandwidth = bandwidth
+        self.section_gap = section_gap
+        self.requests = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{0}".format(self.server_address[1])
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients stopping a streamed download early reset their connection.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            http.server.ThreadingHTTPServer.handle_error(self, request, client_address)
+
+    def wait(self, seconds):
+        self._stopped.wait(seconds)
+
+    def _read(self, *parts):
+        path = os.path.join(self.fixtures_dir, *parts)
+        with self._lock:
+            page = self._pages.get(path)
+            if page is None and os.path.isfile(path):
+                with open(path, "rb") as f: page = f.read()
+                if self.section_gap and parts[0] == "siteinfo": page = spread_sections(page, self.section_gap)
+                self._pages[path] = page
+            self.requests += 1
+        return page
+
+    def page(self, path):
+        """
+        Return the saved page served for the request path `path`, or None.
+        """
+        m = _topsite_path.match(path)
+        if m is not None:
+            category = os.path.join(*m.group(2).split("/"))
+            page = self._read("topsites", category, "{0}.html".format(int(m.group(1) or 0)))
+            if page is not None: return page
+            pages = glob.glob(os.path.join(self.fixtures_dir, "topsites", category, "*.html"))
+            if len(pages) == 0: return None
+            last = max(int(os.path.basename(p)[:-5]) for p in pages)
+            return self._read("topsites", category, "{0}.html".format(last))
+        if path.startswith("/?"):
+            action = urlparse.parse_qs(path[2:]).get("Action", [""])[0]
+            return self._read("awis", os.path.basename(action) + ".xml")
+        for kind in ("siteinfo", "whois"):
+            prefix = "/{0}/".format(kind)
+            if path.startswith(prefix):
+                name = os.path.basename(path[len(prefix):])
+                return self._read(kind, name + ".html") or self._read(kind, "notfound.invalid.html")
+        return None
+
+def redirect(base_url):
+    """
+    Point the fetch functions of `alexa` and `whois` at the stub at `base_url`.
+    Return a function restoring the real sites.
+    """
+    saved = (alexa._siteinfo_base_url, alexa._topsite_base_url, whois._whois_base_url)
+    alexa._siteinfo_base_url = base_url + "/siteinfo/"
+    alexa._topsite_base_url = base_url + "/topsites/category"
+    whois._whois_base_url = base_url + "/whois/"
+    def restore():
+        alexa._siteinfo_base_url, alexa._topsite_base_url, whois._whois_base_url = saved
+    return restore
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", default=_fixtures_dir, help="directory of saved pages")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added before every response")
+    parser.add_argument("--bandwidth", type=float, help="bytes per second of each response (default: unlimited)")
+    parser.add_argument("--section-gap", type=int, default=0, help="bytes of markup added between siteinfo sections")
+    args = parser.parse_args(argv)
+    server = StubServer(args.fixtures, args.delay, args.port, bandwidth=args.bandwidth, section_gap=args.section_gap)
+    print("serving {0} on {1}".format(args.fixtures, server.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+The benchmark suite of the public entry points of `alexa` and `whois`, replayed against `stub_server`.
+
+Measures:
+- the median latency of single calls of each entry point;
+- the throughput of the bulk fetchers at several concurrency levels;
+- the pages per second of each parser on the saved pages;
+- the peak memory traced by `tracemalloc` during one call of each entry point.
+Results can be saved as a baseline, and later runs compared with it: a metric worse than
+the baseline by more than `--tolerance` is reported as a regression, and the script exits with status 1.
+A baseline is only compared with runs of the parser backend it was recorded with; for another backend,
+the script exits with status 2 without comparing (save a baseline of its own with `--backend` and `--save`).
+
+Usage
+--------
+python benchmarks/suite.py [--delay SECONDS] [--calls N] [--items N] [--levels 1,4,16]
+                           [--save baseline.json] [--compare baseline.json] [--tolerance 0.25]
+                           [--backend stdlib|lxml|auto]
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stub_server
+import alexa
+import backend
+import transport
+import whois
+
+_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def _names(kind):
+    pages = glob.glob(os.path.join(stub_server._fixtures_dir, kind, "*.html"))
+    return sorted(os.path.basename(p)[:-5] for p in pages)
+
+def _categories():
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(stub_server._fixtures_dir, "topsites", "*")))
+
+def _quiet(function, *args, **kwargs):
+    # "Not found" lookups are part of the workload.
+    try:
+        return function(*args, **kwargs)
+    except ValueError:
+        return None
+
+def _entry_points():
+    domain = _names("whois")[0]
+    site = _names("siteinfo")[0]
+    category = _categories()[0]
+    return [
+        ("alexa.get_website_info", lambda: _quiet(alexa.get_website_info, site)),
+        ("alexa.get_website_info stream", lambda: _quiet(alexa.get_website_info, site, stream=True)),
+        ("alexa.get_topsites_by_category", lambda: alexa.get_topsites_by_category(category)),
+        ("alexa.get_topsites_by_category window=4", lambda: alexa.get_topsites_by_category(category, window=4)),
+        ("whois.who_is", lambda: _quiet(whois.who_is, domain)),
+        ("whois.who_is stream", lambda: _quiet(whois.who_is, domain, stream=True)),
+    ]
+
+def _parsers():
+    def pages(kind):
+        texts = []
+        for page in sorted(glob.glob(os.path.join(stub_server._fixtures_dir, kind, "**", "*.html"), recursive=True)):
+            with open(page, encoding="utf8") as f: texts.append(f.read())
+        return texts
+    def topsites(text):
+        try:
+            return alexa._parse_topsite_page(text)
+        except IndexError:
+            return None
+    return [
+        ("alexa.get_website_info_from_str", lambda text: _quiet(alexa.get_website_info_from_str, text), pages("siteinfo")),
+        ("alexa topsites page", topsites, pages("topsites")),
+        ("whois.who_is_from_str", lambda text: _quiet(whois.who_is_from_str, text), pages("whois")),
+    ]
+
+def _bulk(items, levels):
+    domains = [_names("whois")[i % len(_names("whois"))] for i in range(items)]
+    sites = [_names("siteinfo")[i % len(_names("siteinfo"))] for i in range(items)]
+    categories = [_categories()[i % len(_categories())] for i in range(max(1, items // 8))]
+    def siteinfo_many(workers):
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(lambda site: _quiet(alexa.get_website_info, site), sites))
+    for workers in levels:
+        yield ("whois.who_is_many workers={0}".format(workers), len(domains),
+            lambda: list(whois.who_is_many(domains, max_workers=workers)))
+        yield ("alexa.get_website_info threads={0}".format(workers), len(sites), lambda: siteinfo_many(workers))
+        yield ("alexa.get_topsites_by_categories in_flight={0}".format(workers), len(categories),
+            lambda: list(alexa.get_topsites_by_categories(categories, max_in_flight=workers)))
+
+def _peak_kib(function, runs=5):
+    # The median of several runs, as opening a new pooled connection now and then adds to a run's peak.
+    peaks = []
+    for _ in range(runs):
+        tracemalloc.start()
+        try:
+            function()
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        finally:
+            tracemalloc.stop()
+    return statistics.median(peaks)
+
+def run(delay=0.005, calls=20, items=64, levels=(1, 4, 16), parse_repeat=20):
+    """
+    Run the whole suite against a fresh stub, and return a dict mapping metric names
+    to dicts of their "value", "unit" and "better" ("higher" or "lower").
+    """
+    metrics = {}
+    def record(name, value, unit, better):
+        metrics[name] = {"value": value, "unit": unit, "better": better}
+        print("{0:<60} {1:>12.2f} {2}".format(name, value, unit))
+
+    transport.configure(pool_maxsize=max(levels))
+    with stub_server.StubServer(delay=delay) as server:
+        restore = stub_server.redirect(server.base_url)
+        try:
+            for name, call in _entry_points():
+                call()
+                latencies = []
+                for _ in range(calls):
+                    start = time.perf_counter()
+                    call()
+                    latencies.append(time.perf_counter() - start)
+                record("latency " + name, statistics.median(latencies) * 1000, "ms", "lower")
+            for name, count, call in _bulk(items, levels):
+                start = time.perf_counter()
+                call()
+                record("throughput " + name, count / (time.perf_counter() - start), "items/s", "higher")
+            for name, call in _entry_points():
+                record("peak memory " + name, _peak_kib(call), "KiB", "lower")
+        finally:
+            restore()
+    for name, parse, texts in _parsers():
+        start = time.perf_counter()
+        for _ in range(parse_repeat):
+            for text in texts: parse(text)
+        record("parser " + name, parse_repeat * len(texts) / (time.perf_counter() - start), "pages/s", "higher")
+        record("peak memory parser " + name, _peak_kib(lambda: [parse(text) for text in texts]) / len(texts),
+            "KiB/page", "lower")
+    return metrics
+
+def compare(metrics, baseline, tolerance):
+    """
+    Print how `metrics` changed from the `baseline` metrics, and return the names of the metrics
+    worse than their baseline by more than the fraction `tolerance`.
+    """
+    regressions = []
+    print("{0:<60} {1:>12} {2:>12} {3:>8}".format("metric", "baseline", "now", "change"))
+    for name, m in metrics.items():
+        b = baseline.get(name)
+        if b is None or b["value"] == 0: continue
+        change = m["value"] / b["value"] - 1
+        worse = -change if m["better"] == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = " REGRESSION"
+        print("{0:<60} {1:>12.2f} {2:>12.2f} {3:>+7.0%}{4}".format(name, b["value"], m["value"], change, flag))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds the stub waits before each response")
+    parser.add_argument("--calls", type=int, default=20, help="single calls timed per entry point")
+    parser.add_argument("--items", type=int, default=64, help="lookups per bulk run")
+    parser.add_argument("--levels", default="1,4,16", help="comma separated concurrency levels of the bulk runs")
+    parser.add_argument("--save", nargs="?", const=_baseline, help="save the results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=_baseline, help="compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="fraction a metric may worsen by")
+    parser.add_argument("--backend", choices=backend.backends, help="parser backend (default: stdlib)")
+    args = parser.parse_args(argv)
+    if args.backend is not None: backend.set_backend(args.backend)
+    saved = None
+    if args.compare:
+        with open(args.compare, encoding="utf8") as f: saved = json.load(f)
+        # The backends parse at different speeds, so their differences are not regressions.
+        # Baselines saved before backends existed were recorded with the stdlib parser.
+        if saved.get("backend", "stdlib") != backend.get_backend():
+            print("error: the baseline was recorded with the {0} backend, this run uses {1} (see --backend)".format(
+                saved.get("backend", "stdlib"), backend.get_backend()), file=sys.stderr)
+            return 2
+
+    metrics = run(args.delay, args.calls, args.items, [int(level) for level in args.levels.split(",")])
+    if args.save:
+        with open(args.save, "w", encoding="utf8") as f:
+            json.dump({"python": platform.python_version(), "backend": backend.get_backend(),
+                "delay": args.delay, "metrics": metrics}, f, indent=2)
+    if saved is not None:
+        regressions = compare(metrics, saved["metrics"], args.tolerance)
+        if regressions:
+            print("{0} regressions".format(len(regressions)))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
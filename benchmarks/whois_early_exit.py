@@ -0,0 +1,74 @@
+"""
+Benchmark the early exit of `whois.WhoIsHTMLParser` on a corpus of saved whois.com pages.
+
+Every page is parsed twice: fed whole to a parser without `stop_early`, as `who_is` used to do,
+and streamed in chunks to a parser with `stop_early`, as `who_is(stream=True)` does.
+Both must give the same result; the bytes read and CPU time of each are reported.
+
+Usage
+--------
+python benchmarks/whois_early_exit.py [corpus_dir] [--repeat N] [--chunk-size N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import streaming
+import whois
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "whois")
+
+def _parse_full(text):
+    p = whois.WhoIsHTMLParser()
+    p.feed(text)
+    return p.data, len(text.encode())
+
+def _parse_early(text, chunk_size):
+    read = [0]
+    def chunks():
+        for i in range(0, len(text), chunk_size):
+            chunk = text[i:i+chunk_size]
+            read[0] += len(chunk.encode())
+            yield chunk
+    p = whois.WhoIsHTMLParser(stop_early=True)
+    streaming.feed(p, chunks())
+    return p.data, read[0]
+
+def _cpu_time(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat): result = fn()
+    return (time.process_time() - start) / repeat, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=_fixtures_dir, help="directory of saved whois.com pages")
+    parser.add_argument("--repeat", type=int, default=50, help="parses per page and mode")
+    parser.add_argument("--chunk-size", type=int, default=streaming._chunk_size, help="characters per streamed chunk")
+    args = parser.parse_args(argv)
+
+    pages = sorted(glob.glob(os.path.join(args.corpus, "*.html")))
+    if len(pages) == 0: parser.error("no .html pages in " + args.corpus)
+    print("{0:<32} {1:>10} {2:>10} {3:>10} {4:>10} {5:>8}".format(
+        "page", "full B", "early B", "full ms", "early ms", "saved"))
+    totals = [0, 0, 0.0, 0.0]
+    for page in pages:
+        with open(page, encoding="utf8") as f: text = f.read()
+        full_cpu, (full_data, full_bytes) = _cpu_time(lambda: _parse_full(text), args.repeat)
+        early_cpu, (early_data, early_bytes) = _cpu_time(lambda: _parse_early(text, args.chunk_size), args.repeat)
+        if full_data != early_data: raise AssertionError("early exit changed the result of " + page)
+        totals[0] += full_bytes
+        totals[1] += early_bytes
+        totals[2] += full_cpu
+        totals[3] += early_cpu
+        print("{0:<32} {1:>10} {2:>10} {3:>10.3f} {4:>10.3f} {5:>7.1%}".format(os.path.basename(page),
+            full_bytes, early_bytes, full_cpu * 1000, early_cpu * 1000, 1 - early_cpu / full_cpu))
+    n = len(pages)
+    print("{0:<32} {1:>10.0f} {2:>10.0f} {3:>10.3f} {4:>10.3f} {5:>7.1%}".format("mean per lookup",
+        totals[0] / n, totals[1] / n, totals[2] / n * 1000, totals[3] / n * 1000, 1 - totals[3] / totals[2]))
+
+if __name__ == "__main__":
+    main()
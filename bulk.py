@@ -0,0 +1,73 @@
+"""
+The bounded, completion-order thread pool loop shared by the bulk lookups of every module
+(`whois.who_is_many`, `alexa.get_topsites_by_categories`, `awis_via_auth.AwisClient.url_info_many`,
+`jobs.Job`, `refresh.Refresh` and the `whois_alexa` command line).
+
+Items are taken from the work list only as calls complete, with at most a window of calls submitted at once,
+so the work list can be a generator longer than memory, and results are yielded as soon as they are ready.
+
+Example
+--------
+```
+import bulk
+import whois
+for domain, result in bulk.outcomes(whois.who_is, open("domains.txt").read().split(), max_workers=16):
+    if isinstance(result, Exception):
+        print(domain, "failed:", result)
+```
+"""
+
+import concurrent.futures
+
+def finished(function):
+    """
+    Return a done future holding the result of `function()`, or the exception it raised.
+    """
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(function())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def completed(call, items, max_workers, window=None, cached=None):
+    """
+    Call `call(item)` for every item of the iterable `items` over a pool of `max_workers` threads,
+    and yield `(item, future)` pairs in completion order, where `future` is done.
+    At most `window` calls (two per thread by default) are submitted at once.
+    `cached(item)`, if given, is called on the consuming thread before an item is submitted;
+    when it returns a future (e.g. `finished(entry.value)`), the item is yielded at once with it instead.
+    Closing the generator cancels the calls not started yet.
+    """
+    if window is None: window = 2 * max_workers
+    items = iter(items)
+    pending = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+    try:
+        while True:
+            for item in items:
+                future = None if cached is None else cached(item)
+                if future is not None:
+                    yield item, future
+                    continue
+                pending[executor.submit(call, item)] = item
+                if len(pending) >= window: break
+            if not pending: break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+    finally:
+        for future in pending: future.cancel()
+        executor.shutdown(wait=False)
+
+def outcomes(call, items, max_workers, window=None, cached=None):
+    """
+    Like `completed`, but yield `(item, result)` pairs, where `result` is what `call(item)` returned,
+    or the exception it raised, so one failing item does not abort the batch.
+    """
+    for item, future in completed(call, items, max_workers, window, cached):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = e
+        yield item, result
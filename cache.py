@@ -0,0 +1,265 @@
+"""
+A persistent, opt-in response cache for `whois.who_is` and `alexa.get_website_info`,
+backed by a single SQLite file.
+
+Both the raw HTML page and the parsed json structure are stored, keyed by the lookup
+source ("whois" or "alexa") and the normalized domain name.
+Entries expire after a per-source TTL, "not found" results are cached for `negative_ttl`
+seconds, and the least recently used entries are evicted once the cache grows past `max_bytes`.
+Expired entries are kept until evicted, with the validators (ETag, Last-Modified) and digest
+of their page, so that `refresh` can revalidate them instead of fetching and parsing them again.
+
+Example
+--------
+```
+import cache
+import whois
+c = cache.DiskCache("lookups.sqlite", ttl={"whois": 30 * 86400})
+result = whois.who_is("google.com", cache=c)
+# a second call is served from the cache, without touching the network.
+result = whois.who_is("google.com", cache=c)
+print(c.stats())
+```
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+_default_ttl = {"whois": 7 * 86400, "alexa": 86400}
+
+_validator_columns = (("etag", "TEXT"), ("last_modified", "TEXT"), ("digest", "TEXT"), ("length", "INTEGER"))
+
+def _normalize(key):
+    return key.strip().lower().rstrip(".")
+
+def digest(raw):
+    """
+    Return the content hash of the page `raw`, as stored with its entry.
+    """
+    return hashlib.blake2b(raw.encode("utf8"), digest_size=16).hexdigest()
+
+class CacheEntry():
+    """
+    A cached lookup: the raw page `raw`, and either the parsed json structure `parsed`
+    or, for a cached "not found" result, the error message `error`.
+    `etag` and `last_modified` are the validators sent with the page, `digest` its content hash
+    and `length` its size in bytes; `expired` tells whether the entry is past its TTL.
+    """
+    __slots__ = ("raw", "parsed", "error", "etag", "last_modified", "digest", "length", "expired")
+
+    def __init__(self, raw, parsed, error, etag=None, last_modified=None, digest=None, length=None, expired=False):
+        self.raw = raw
+        self.parsed = parsed
+        self.error = error
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.length = length
+        self.expired = expired
+
+    def value(self):
+        """
+        Return the parsed result, or raise the cached `ValueError` of a "not found" entry.
+        """
+        if self.error is not None:
+            raise ValueError(self.error)
+        return self.parsed
+
+class DiskCache():
+    """
+    A cache stored in the SQLite database file `path`.
+    `ttl` is either a number of seconds used for every source, or a dict mapping
+    source names to seconds; sources missing from it use the module defaults.
+    `negative_ttl` is the number of seconds a "not found" result is kept.
+    `max_bytes` caps the total size of the stored pages and results.
+    With `store_raw` False only parsed results are kept.
+    The cache can be shared by several threads.
+    """
+    def __init__(self, path, ttl=None, negative_ttl=86400, max_bytes=256 * 1024 * 1024, store_raw=True):
+        self._ttl = dict(_default_ttl)
+        self._default_ttl = None
+        if isinstance(ttl, dict): self._ttl.update(ttl)
+        elif ttl is not None: self._default_ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._max_bytes = max_bytes
+        self._store_raw = store_raw
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            raw TEXT,
+            parsed TEXT,
+            error TEXT,
+            expires REAL NOT NULL,
+            accessed REAL NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (source, key))""")
+        columns = set(row[1] for row in self._db.execute("PRAGMA table_info(entries)"))
+        for name, kind in _validator_columns:
+            # Caches created before revalidation was supported.
+            if name not in columns: self._db.execute("ALTER TABLE entries ADD COLUMN {0} {1}".format(name, kind))
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _ttl_for(self, source):
+        if self._default_ttl is not None: return self._default_ttl
+        return self._ttl.get(source, 86400)
+
+    def get(self, source, key, expired=False):
+        """
+        Return the unexpired `CacheEntry` stored for `key` under `source`, or None.
+        With `expired` set, an expired entry is returned too (without counting as a hit), to be revalidated.
+        """
+        key = _normalize(key)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT raw, parsed, error, expires, etag, last_modified, digest, length "
+                "FROM entries WHERE source = ? AND key = ?", (source, key)).fetchone()
+            stale = row is not None and row[3] <= now
+            if row is None or stale:
+                self.misses += 1
+                if row is None or not expired: return None
+            else:
+                self._db.execute("UPDATE entries SET accessed = ? WHERE source = ? AND key = ?", (now, source, key))
+                self._db.commit()
+                self.hits += 1
+                if row[2] is not None: self.negative_hits += 1
+        return CacheEntry(row[0], None if row[1] is None else json.loads(row[1]), row[2],
+            row[4], row[5], row[6], row[7], stale)
+
+    def raw(self, source, key):
+        """
+        Return the raw page stored for `key` under `source`, even if it has expired, or None.
+        This lets saved pages be parsed again after the parsers change.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT raw FROM entries WHERE source = ? AND key = ?",
+                (source, _normalize(key))).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, source, key, raw, parsed=None, error=None, etag=None, last_modified=None):
+        """
+        Store the page `raw` for `key` under `source`, with either its parsed result `parsed`
+        or the "not found" message `error`, and the validators `etag` and `last_modified` of the page.
+        """
+        key = _normalize(key)
+        content_digest = length = None
+        if raw is not None:
+            content_digest = digest(raw)
+            length = len(raw.encode("utf8"))
+        if not self._store_raw: raw = None
+        parsed = None if error is not None else json.dumps(parsed)
+        ttl = self._negative_ttl if error is not None else self._ttl_for(source)
+        size = len(raw or "") + len(parsed or "") + len(error or "")
+        now = time.time()
+        with self._lock:
+            self._delete(source, key)
+            self._db.execute("INSERT INTO entries (source, key, raw, parsed, error, expires, accessed, size, "
+                "etag, last_modified, digest, length) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, key, raw, parsed, error, now + ttl, now, size, etag, last_modified, content_digest, length))
+            self._size += size
+            self._evict()
+            self._db.commit()
+
+    def store(self, source, key, raw, parse, etag=None, last_modified=None):
+        """
+        Parse the fetched page `raw` with `parse`, cache the outcome and return the result.
+        A `ValueError` raised by `parse` is cached as a "not found" entry and re-raised.
+        """
+        try:
+            parsed = parse(raw)
+        except ValueError as e:
+            self.put(source, key, raw, error=str(e), etag=etag, last_modified=last_modified)
+            raise
+        self.put(source, key, raw, parsed, etag=etag, last_modified=last_modified)
+        return parsed
+
+    def renew(self, source, key, etag=None, last_modified=None):
+        """
+        Restart the TTL of the entry stored for `key` under `source`, whose page was found unchanged,
+        replacing its validators with `etag` and `last_modified` when given. Return whether an entry was renewed.
+        """
+        key = _normalize(key)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT error FROM entries WHERE source = ? AND key = ?", (source, key)).fetchone()
+            if row is None: return False
+            ttl = self._negative_ttl if row[0] is not None else self._ttl_for(source)
+            self._db.execute("UPDATE entries SET expires = ?, accessed = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE source = ? AND key = ?",
+                (now + ttl, now, etag, last_modified, source, key))
+            self._db.commit()
+        return True
+
+    def lookup(self, source, key, fetch, parse):
+        """
+        Return the cached result for `key` under `source`. On a miss, fetch the page with `fetch()`,
+        which returns the page content or None, and parse and cache it with `store`.
+        """
+        entry = self.get(source, key)
+        if entry is not None:
+            return entry.value()
+        raw = fetch()
+        if raw is None: return None
+        return self.store(source, key, raw, parse)
+
+    def invalidate(self, source, key):
+        """
+        Drop the entry stored for `key` under `source`.
+        """
+        with self._lock:
+            self._delete(source, _normalize(key))
+            self._db.commit()
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self._size = 0
+
+    def stats(self):
+        """
+        Return a dict of hit, miss and eviction counters, with the number of entries and bytes stored.
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "negative hits": self.negative_hits,
+                "evictions": self.evictions, "entries": entries, "bytes": self._size}
+
+    def _delete(self, source, key):
+        row = self._db.execute("SELECT size FROM entries WHERE source = ? AND key = ?", (source, key)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM entries WHERE source = ? AND key = ?", (source, key))
+            self._size -= row[0]
+
+    def _evict(self):
+        while self._size > self._max_bytes:
+            rows = self._db.execute("SELECT source, key, size FROM entries ORDER BY accessed LIMIT 64").fetchall()
+            if len(rows) == 0: break
+            for source, key, size in rows:
+                self._db.execute("DELETE FROM entries WHERE source = ? AND key = ?", (source, key))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= self._max_bytes: break
@@ -0,0 +1,213 @@
+"""
+Columnar export of bulk results to Parquet files, through **pyarrow**.
+
+The json structures returned by `alexa.get_website_info`, `whois.who_is` and
+`alexa.get_topsites_by_category` are flattened into typed columns
+(ranks as ints, percentages as floats, name servers as lists...) and written
+incrementally, one row group every `row_group_size` rows, so a bulk run never
+holds more than one row group in memory.
+Files are loaded back with `read`, whose filters skip the row groups that cannot match.
+
+Requirement
+--------
+**python 3**
+**pyarrow** 1.0 + : https://arrow.apache.org/docs/python/
+
+Example
+--------
+```
+import columnar
+import whois
+with columnar.ColumnarWriter("whois.parquet", "whois") as w:
+    w.write_all(whois.who_is_many(domains))
+table = columnar.read("whois.parquet", columns=["key", "registrar"], filters=[("registrant_country", "==", "US")])
+```
+"""
+
+import alexa
+import instrument
+import whois
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+kinds = ("siteinfo", "whois", "topsites")
+
+def _require_pyarrow():
+    if pa is None: raise ImportError("Columnar export requires pyarrow.")
+
+def _schema(kind):
+    if kind == "siteinfo":
+        return pa.schema([
+            ("key", pa.string()),
+            ("global_rank", pa.int64()),
+            ("local_rank", pa.int64()),
+            ("country", pa.string()),
+            ("bounce_rate", pa.float64()),
+            ("pageviews_per_visitor", pa.float64()),
+            ("time_on_site", pa.int32()),
+            ("sites_linking_in", pa.int64()),
+            ("category", pa.string()),
+            ("loadspeed", pa.string()),
+            ("male", pa.float64()),
+            ("female", pa.float64()),
+            ("country_shares", pa.list_(pa.struct([
+                ("country", pa.string()), ("percentage", pa.float64()), ("rank", pa.int64())]))),
+            ("related_sites", pa.list_(pa.string())),
+        ])
+    if kind == "whois":
+        return pa.schema([
+            ("key", pa.string()),
+            ("domain_name", pa.string()),
+            ("registrar", pa.string()),
+            ("registrar_iana_id", pa.int64()),
+            ("registrar_url", pa.string()),
+            ("creation_date", pa.string()),
+            ("updated_date", pa.string()),
+            ("expiration_date", pa.string()),
+            ("registrant_organization", pa.string()),
+            ("registrant_country", pa.string()),
+            ("name_servers", pa.list_(pa.string())),
+            ("domain_status", pa.list_(pa.string())),
+            ("dnssec", pa.string()),
+        ])
+    if kind == "topsites":
+        return pa.schema([
+            ("key", pa.string()),
+            ("rank", pa.int64()),
+            ("address", pa.string()),
+            ("description", pa.string()),
+        ])
+    raise ValueError("Unknown result kind: " + str(kind))
+
+def _siteinfo_rows(key, result):
+    s = alexa.SiteInfo.from_dict(result)
+    gender = s.visitor_gender or {}
+    yield {
+        "key": key,
+        "global_rank": s.global_rank,
+        "local_rank": s.local_rank,
+        "country": s.country,
+        "bounce_rate": s.bounce_rate,
+        "pageviews_per_visitor": s.pageviews_per_visitor,
+        "time_on_site": s.time_on_site,
+        "sites_linking_in": s.sites_linking_in,
+        "category": s.category,
+        "loadspeed": s.loadspeed,
+        "male": gender.get("male"),
+        "female": gender.get("female"),
+        "country_shares": None if s.visitors_by_country is None else
+            [{"country": c.country, "percentage": c.percentage, "rank": c.rank} for c in s.visitors_by_country],
+        "related_sites": s.related_sites,
+    }
+
+def _whois_rows(key, result):
+    r = whois.WhoIsRecord.from_dict(result)
+    registry = r.registry or {}
+    registrar = r.registrar or {}
+    registrant = r.registrant or {}
+    status = registry.get("Status") if r.domain_status is None else r.domain_status
+    yield {
+        "key": key,
+        "domain_name": r.domain_name or registry.get("Domain Name"),
+        "registrar": registrar.get("Name", registry.get("Registrar")),
+        "registrar_iana_id": r.registrar_iana_id,
+        "registrar_url": registrar.get("URL", registry.get("Referral URL")),
+        "creation_date": r.creation_date or registry.get("Creation Date"),
+        "updated_date": r.updated_date or registry.get("Updated Date"),
+        "expiration_date": registrar.get("Registration Expiration Date", registry.get("Expiration Date")),
+        "registrant_organization": registrant.get("Organization"),
+        "registrant_country": registrant.get("Country"),
+        "name_servers": whois._as_list(registry.get("Name Server", r.name_servers)),
+        "domain_status": whois._as_list(status),
+        "dnssec": r.dnssec,
+    }
+
+def _topsites_rows(key, result):
+    for entry in result.get("list", []):
+        e = alexa.TopSiteEntry.from_dict(entry)
+        yield {"key": key, "rank": e.rank, "address": e.address, "description": e.description}
+
+_flatteners = {
+    "siteinfo": _siteinfo_rows,
+    "whois": _whois_rows,
+    "topsites": _topsites_rows,
+}
+
+class ColumnarWriter():
+    """
+    Write results of one `kind` ("siteinfo", "whois" or "topsites") to the Parquet file `path`.
+    Rows are buffered column by column and written as a row group of `row_group_size` rows,
+    compressed with `compression`. Use it as a context manager, or call `close()` to write the last row group.
+    """
+    def __init__(self, path, kind, row_group_size=10000, compression="zstd"):
+        _require_pyarrow()
+        self.kind = kind
+        self.schema = _schema(kind)
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._flatten = _flatteners[kind]
+        self._names = self.schema.names
+        self._columns = dict((name, []) for name in self._names)
+        self._buffered = 0
+        self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, key, result):
+        """
+        Add the rows flattened from the json structure `result`, fetched for `key`
+        (the domain, url or category it was fetched for).
+        """
+        for row in self._flatten(key, result):
+            for name in self._names:
+                self._columns[name].append(row[name])
+            self._buffered += 1
+            if self._buffered >= self.row_group_size: self.flush()
+
+    def write_all(self, pairs):
+        """
+        Write the `(key, result)` pairs yielded by the bulk fetchers, such as `whois.who_is_many`
+        or `alexa.get_topsites_by_categories`. Pairs whose result is an exception are skipped.
+        Return the number of results written.
+        """
+        count = 0
+        for key, result in pairs:
+            if isinstance(result, Exception) or result is None: continue
+            self.write(key, result)
+            count += 1
+        return count
+
+    def flush(self):
+        """
+        Write the buffered rows as one row group.
+        """
+        if self._buffered == 0: return
+        with instrument.timer("serialize", "columnar"):
+            arrays = [pa.array(self._columns[field.name], type=field.type) for field in self.schema]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows += self._buffered
+        self._columns = dict((name, []) for name in self._names)
+        self._buffered = 0
+
+    def close(self):
+        if self._writer is None: return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+def read(path, columns=None, filters=None):
+    """
+    Return the `pyarrow.Table` stored in the Parquet file `path`, restricted to `columns` if given.
+    `filters` selects rows with pyarrow's filter expressions or lists of `(column, op, value)` tuples,
+    e.g. `[("global_rank", "<", 1000)]`; row groups whose statistics exclude them are not even read.
+    """
+    _require_pyarrow()
+    return pq.read_table(path, columns=columns, filters=filters)
@@ -0,0 +1,204 @@
+"""
+Instrumentation hooks for the fetch, parse and serialize phases of every lookup.
+
+A hook is a function `hook(call, phase, value)`, called once per measurement:
+- `call` names the lookup being measured: "alexa.siteinfo", "alexa.topsites", "whois" or "awis",
+  or the writer serializing results: "json", "jsonl" or "columnar" (None outside of any).
+- `phase` is one of:
+  "connect" (seconds to resolve and open a new connection, TLS included),
+  "ttfb" (seconds from sending a request to its response headers, connect included),
+  "download" (seconds spent reading the response body), "bytes" (bytes of body, once decompressed),
+  "parse" (seconds spent parsing a page), "result size" (bytes of the result as compact json),
+  "serialize" (seconds spent encoding and writing results) and "serialized bytes".
+- `value` is the measurement.
+
+With no hook added, nothing is measured: each instrumented point costs one list check.
+
+Example
+--------
+```
+import alexa
+import instrument
+collector = instrument.Collector()
+instrument.add_hook(collector)
+alexa.get_website_info("google.com")
+print(collector.summary()["alexa.siteinfo"]["parse"]["p90"])
+```
+"""
+
+import contextlib
+import functools
+import json
+import random
+import threading
+import time
+
+hooks = []
+_local = threading.local()
+
+def add_hook(hook):
+    """
+    Call `hook(call, phase, value)` for every measurement from now on.
+    """
+    if hook not in hooks: hooks.append(hook)
+
+def remove_hook(hook):
+    """
+    Stop calling `hook`.
+    """
+    if hook in hooks: hooks.remove(hook)
+
+def current_call():
+    """
+    Return the name of the lookup measured on this thread, or None.
+    """
+    return getattr(_local, "call", None)
+
+def emit(phase, value, call=None):
+    """
+    Pass the measurement `value` of `phase` to every hook, on behalf of `call`,
+    or of the lookup measured on this thread if `call` is None.
+    """
+    if call is None: call = getattr(_local, "call", None)
+    for hook in list(hooks):
+        hook(call, phase, value)
+
+class _Span():
+    __slots__ = ("call", "outer")
+
+    def __init__(self, call):
+        self.call = call
+
+    def __enter__(self):
+        self.outer = getattr(_local, "call", None)
+        # A lookup made by another one is measured as part of it.
+        if self.outer is None: _local.call = self.call
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.call = self.outer
+
+_null_span = contextlib.nullcontext()
+
+def span(call):
+    """
+    Return a context manager under which the measurements made on this thread are reported for `call`.
+    """
+    if not hooks: return _null_span
+    return _Span(call)
+
+def measured(call):
+    """
+    Decorate a function so that the measurements made while it runs are reported for `call`.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not hooks: return function(*args, **kwargs)
+            with _Span(call):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def result_size(result):
+    """
+    Emit the "result size" of the json-compatible `result`, and return it.
+    """
+    if hooks and result is not None:
+        emit("result size", len(json.dumps(result, separators=(",", ":"))))
+    return result
+
+class _Timer():
+    __slots__ = ("phase", "call", "start")
+
+    def __init__(self, phase, call):
+        self.phase = phase
+        self.call = call
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        emit(self.phase, time.perf_counter() - self.start, self.call)
+
+def timer(phase, call=None):
+    """
+    Return a context manager emitting the seconds spent under it as `phase`.
+    """
+    if not hooks: return _null_span
+    return _Timer(phase, call)
+
+def _percentile(ordered, p):
+    # Linear interpolation between the closest ranks of the sorted samples `ordered`.
+    if len(ordered) == 1: return ordered[0]
+    k = (len(ordered) - 1) * p / 100.0
+    i = int(k)
+    if i + 1 >= len(ordered): return ordered[-1]
+    return ordered[i] + (ordered[i + 1] - ordered[i]) * (k - i)
+
+class _Series():
+    __slots__ = ("count", "total", "minimum", "maximum", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.samples = []
+
+class Collector():
+    """
+    A hook keeping every measurement, summarized per call and phase by `summary`.
+    Counts, sums and extremes are exact; percentiles are computed over a uniform sample
+    of at most `max_samples` measurements per call and phase.
+    """
+    def __init__(self, max_samples=10000, percentiles=(50, 90, 99)):
+        self.max_samples = max_samples
+        self.percentiles = percentiles
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, call, phase, value):
+        with self._lock:
+            s = self._series.get((call, phase))
+            if s is None: s = self._series[(call, phase)] = _Series()
+            s.count += 1
+            s.total += value
+            if s.minimum is None or value < s.minimum: s.minimum = value
+            if s.maximum is None or value > s.maximum: s.maximum = value
+            if len(s.samples) < self.max_samples:
+                s.samples.append(value)
+            else:
+                i = random.randrange(s.count)
+                if i < self.max_samples: s.samples[i] = value
+
+    def summary(self):
+        """
+        Return a dict mapping each call, then each phase, to a dict of its "count", "sum", "mean",
+        "min", "max" and percentiles ("p50", "p90", "p99" by default).
+        """
+        with self._lock:
+            series = [(key, s.count, s.total, s.minimum, s.maximum, sorted(s.samples))
+                for key, s in self._series.items()]
+        result = {}
+        for (call, phase), count, total, minimum, maximum, ordered in series:
+            d = {"count": count, "sum": total, "mean": total / count, "min": minimum, "max": maximum}
+            for p in self.percentiles:
+                d["p{0:g}".format(p)] = _percentile(ordered, p)
+            result.setdefault(str(call), {})[phase] = d
+        return result
+
+    def export(self, file_name):
+        """
+        Save the `summary` as a .json file named `file_name`.
+        """
+        with open(file_name, "w", encoding="utf8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def reset(self):
+        """
+        Forget every measurement.
+        """
+        with self._lock:
+            self._series = {}
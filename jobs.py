@@ -0,0 +1,207 @@
+"""
+Resumable crawl jobs, checkpointed item by item in a SQLite file.
+
+A job runs one fetch function over a work list (domains or categories) with a pool of threads,
+and records the outcome of every item in a `Checkpoint` as it completes.
+Running the job again with the same name and checkpoint skips the items already done,
+so an interrupted crawl resumes where it stopped instead of starting over.
+"Not found" results (`ValueError`) count as done; other errors are retried by the next run.
+
+Example
+--------
+```
+import jobs
+checkpoint = jobs.Checkpoint("crawl.sqlite")
+job = jobs.Job("whois", "whois", open("domains.txt").read().split(), checkpoint, max_workers=16)
+for domain, result in job.run():
+    print(job.progress())
+# every result, including those of earlier runs:
+for domain, result, error in checkpoint.results("whois"):
+    pass
+```
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import alexa
+import bulk
+import whois
+
+fetchers = {
+    "whois": whois.who_is,
+    "siteinfo": alexa.get_website_info,
+    "topsites": alexa.get_topsites_by_category,
+}
+
+class Checkpoint():
+    """
+    The completion record of jobs, stored in the SQLite database file `path`.
+    Writes are committed every `commit_every` items; after a crash, at most that many
+    completed items are fetched again.
+    """
+    def __init__(self, path, commit_every=64):
+        self._commit_every = commit_every
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS items (
+            job TEXT NOT NULL,
+            item TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL,
+            finished REAL NOT NULL,
+            PRIMARY KEY (job, item))""")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def done(self, job):
+        """
+        Return the set of items of `job` that are done.
+        """
+        with self._lock:
+            return set(row[0] for row in self._db.execute(
+                "SELECT item FROM items WHERE job = ? AND status = 'done'", (job,)))
+
+    def mark(self, job, item, result=None, error=None, failed=False):
+        """
+        Record the outcome of `item` in `job`: its json-compatible `result`, or the error message `error`.
+        With `failed` set the item is recorded as failed, to be retried by the next run.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM items WHERE job = ? AND item = ?", (job, item)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job, item, "failed" if failed else "done", None if error is not None else json.dumps(result),
+                error, 1 if row is None else row[0] + 1, time.time()))
+            self._uncommitted += 1
+            if self._uncommitted >= self._commit_every: self._commit()
+
+    def commit(self):
+        """
+        Commit the recorded outcomes now.
+        """
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        self._db.commit()
+        self._uncommitted = 0
+
+    def results(self, job):
+        """
+        Yield `(item, result, error)` for every item of `job` that is done, in completion order.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT item, result, error FROM items WHERE job = ? AND status = 'done' "
+                "ORDER BY finished", (job,)).fetchall()
+        for item, result, error in rows:
+            yield item, None if result is None else json.loads(result), error
+
+    def failures(self, job):
+        """
+        Return a dict mapping the failed items of `job` to their last error message.
+        """
+        with self._lock:
+            return dict(self._db.execute("SELECT item, error FROM items WHERE job = ? AND status = 'failed'", (job,)))
+
+    def counts(self, job):
+        """
+        Return a dict of the number of items of `job` per status.
+        """
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM items WHERE job = ? GROUP BY status", (job,)))
+
+    def reset(self, job):
+        """
+        Forget every item of `job`.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM items WHERE job = ?", (job,))
+            self._commit()
+
+class Job():
+    """
+    The job `name`, fetching every item of `items` with `fetch`, which is either a function of one item
+    or the name of one of `fetchers` ("whois", "siteinfo" or "topsites").
+    Outcomes are recorded in the `Checkpoint` `checkpoint`. At most `max_workers` items are fetched at once.
+    """
+    def __init__(self, name, fetch, items, checkpoint, max_workers=8):
+        self.name = name
+        self.fetch = fetchers[fetch] if isinstance(fetch, str) else fetch
+        self.items = list(items)
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._started = None
+        self._finished = None
+        self._skipped = 0
+        self._done = 0
+        self._failed = 0
+        self._pending = len(self.items)
+
+    def run(self):
+        """
+        Fetch the items not done yet, and yield `(item, result)` pairs in completion order,
+        where `result` is the fetched result or the exception raised by `fetch`.
+        """
+        done = self.checkpoint.done(self.name)
+        todo = [item for item in self.items if item not in done]
+        with self._lock:
+            self._started = time.monotonic()
+            self._finished = None
+            self._skipped = len(self.items) - len(todo)
+            self._done = self._failed = 0
+            self._pending = len(todo)
+        completed = bulk.completed(self.fetch, todo, self.max_workers)
+        try:
+            for item, future in completed:
+                try:
+                    result = future.result()
+                except ValueError as e:
+                    result = e
+                    self.checkpoint.mark(self.name, item, error=str(e))
+                except Exception as e:
+                    result = e
+                    self.checkpoint.mark(self.name, item, error=repr(e), failed=True)
+                else:
+                    self.checkpoint.mark(self.name, item, result)
+                with self._lock:
+                    self._pending -= 1
+                    if isinstance(result, Exception) and not isinstance(result, ValueError): self._failed += 1
+                    else: self._done += 1
+                yield item, result
+        finally:
+            completed.close()
+            self.checkpoint.commit()
+            with self._lock:
+                self._finished = time.monotonic()
+
+    def progress(self):
+        """
+        Return a dict describing the current (or last) run: the number of items in the work list,
+        skipped as already done, done and failed by this run, and still pending; the elapsed seconds,
+        the throughput in items per second, and the estimated seconds left.
+        """
+        with self._lock:
+            if self._started is None: elapsed = 0.0
+            else: elapsed = (self._finished or time.monotonic()) - self._started
+            completed = self._done + self._failed
+            rate = completed / elapsed if elapsed > 0 else 0.0
+            return {"total": len(self.items), "skipped": self._skipped, "done": self._done,
+                "failed": self._failed, "pending": self._pending, "elapsed": elapsed,
+                "items/s": rate, "eta": self._pending / rate if rate > 0 else None}
@@ -0,0 +1,219 @@
+"""
+An append-only JSON Lines writer, to stream bulk results to disk as they arrive.
+
+Each record is written as one line of compact json. Lines are buffered and written
+`buffer_size` bytes at a time; with compression, every write is an independent gzip member
+or zstd frame, so the file stays readable by `gzip`/`zstd` and by `read` at any point.
+A crawl interrupted half way is continued with `resume=True`: a torn last line or member
+is cut off, and `records` tells how many records the file already holds. As bulk results arrive
+in completion order, the items left to look up are those whose keys are not in the file yet
+(or those not marked done by a `jobs.Checkpoint`), not the ones after the first `records` items.
+
+Requirement
+--------
+**python 3**
+**zstandard** (optional, for zstd compression) : https://github.com/indygreg/python-zstandard
+
+Example
+--------
+```
+import jsonl
+import whois
+with jsonl.JSONLinesWriter("whois.jsonl.gz", compression="gzip", resume=True) as w:
+    # Read once the writer has cut off a torn tail, whose records are written again.
+    done = set(record["key"] for record in jsonl.read("whois.jsonl.gz"))
+    w.write_all(whois.who_is_many(d for d in domains if d not in done))
+for record in jsonl.read("whois.jsonl.gz"):
+    print(record["key"])
+```
+"""
+
+import gzip
+import json
+import os
+import time
+import zlib
+import instrument
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+compressions = (None, "gzip", "zstd")
+_scan_chunk_size = 1024 * 1024
+
+def _require_compression(compression):
+    if compression not in compressions: raise ValueError("Unknown compression: " + str(compression))
+    if compression == "zstd" and zstandard is None: raise ImportError("zstd compression requires zstandard.")
+
+def _new_decompressor(compression):
+    if compression == "gzip": return zlib.decompressobj(zlib.MAX_WBITS | 16)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+def _scan_plain(f):
+    # Offset just past the last newline, and the number of lines before it.
+    offset = end = records = 0
+    while True:
+        data = f.read(_scan_chunk_size)
+        if not data: return offset, records
+        last = data.rfind(b"\n")
+        if last >= 0:
+            records += data.count(b"\n")
+            offset = end + last + 1
+        end += len(data)
+
+def _iter_decompressed(f, compression):
+    # Yield `(data, offset)` pairs of decompressed data, with `offset` just past the member (gzip)
+    # or frame (zstd) the data ends, or None in the middle of one. Stops at a torn or corrupt tail.
+    errors = (zlib.error,) if zstandard is None else (zlib.error, zstandard.ZstdError)
+    consumed = 0
+    d = _new_decompressor(compression)
+    data = b""
+    while True:
+        if not data:
+            data = f.read(_scan_chunk_size)
+            if not data: return
+        try:
+            out = d.decompress(data)
+        except errors:
+            return
+        if d.eof:
+            rest = d.unused_data
+            consumed += len(data) - len(rest)
+            yield out, consumed
+            d = _new_decompressor(compression)
+            data = rest
+        else:
+            consumed += len(data)
+            data = b""
+            yield out, None
+
+def _scan_compressed(f, compression):
+    # Offset just past the last complete member or frame, and the number of lines they hold.
+    offset = records = pending = 0
+    for data, end in _iter_decompressed(f, compression):
+        pending += data.count(b"\n")
+        if end is not None:
+            offset = end
+            records += pending
+            pending = 0
+    return offset, records
+
+class JSONLinesWriter():
+    """
+    Append json-compatible records to the JSON Lines file `path`.
+    `compression` is None, "gzip" or "zstd". Records are written every `buffer_size` bytes of json,
+    and the file is fsynced at most every `fsync_interval` seconds (0 fsyncs on every write, None never does).
+    With `resume` set, an existing file is kept and appended to, after cutting off a torn tail;
+    otherwise it is overwritten. `records` is the number of records in the file, `offset` its size in bytes.
+    """
+    def __init__(self, path, compression=None, buffer_size=1024 * 1024, fsync_interval=None, resume=False):
+        _require_compression(compression)
+        self.path = path
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self.offset = 0
+        self._buffer = []
+        self._buffered = 0
+        self._buffered_records = 0
+        self._synced = time.monotonic()
+        if compression == "zstd": self._compressor = zstandard.ZstdCompressor()
+        if resume and os.path.exists(path):
+            self._file = open(path, "r+b")
+            if compression is None: self.offset, self.records = _scan_plain(self._file)
+            else: self.offset, self.records = _scan_compressed(self._file, compression)
+            self._file.seek(self.offset)
+            self._file.truncate()
+        else:
+            self._file = open(path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record):
+        """
+        Append the json-compatible `record`.
+        """
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self._buffered_records += 1
+        if self._buffered >= self.buffer_size: self.flush()
+
+    def write_all(self, pairs):
+        """
+        Write the `(key, result)` pairs yielded by the bulk fetchers, such as `whois.who_is_many`,
+        as `{"key": key, "result": result}` records, or `{"key": key, "error": message}` when `result` is an exception.
+        Return the number of records written.
+        """
+        count = 0
+        for key, result in pairs:
+            if isinstance(result, Exception): self.write({"key": key, "error": repr(result)})
+            else: self.write({"key": key, "result": result})
+            count += 1
+        return count
+
+    def flush(self):
+        """
+        Write the buffered records, and fsync the file if `fsync_interval` has elapsed.
+        """
+        if self._buffered_records == 0: return
+        with instrument.timer("serialize", "jsonl"):
+            data = b"".join(self._buffer)
+            if self.compression == "gzip": data = gzip.compress(data)
+            elif self.compression == "zstd": data = self._compressor.compress(data)
+            self._file.write(data)
+            self._file.flush()
+        if instrument.hooks: instrument.emit("serialized bytes", len(data), "jsonl")
+        self.offset += len(data)
+        self.records += self._buffered_records
+        self._buffer = []
+        self._buffered = 0
+        self._buffered_records = 0
+        if self.fsync_interval is not None and time.monotonic() - self._synced >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Force the written records to disk.
+        """
+        os.fsync(self._file.fileno())
+        self._synced = time.monotonic()
+
+    def close(self):
+        if self._file is None: return
+        self.flush()
+        if self.fsync_interval is not None: self.sync()
+        self._file.close()
+        self._file = None
+
+def read(path, compression="auto", skip=0):
+    """
+    Yield the records of the JSON Lines file `path`, after skipping the first `skip` ones.
+    `compression` is guessed from the file name (".gz" or ".zst") by default. A torn last line is ignored;
+    the complete lines of a torn last member are yielded, although resuming a writer drops them.
+    """
+    if compression == "auto":
+        if path.endswith(".gz"): compression = "gzip"
+        elif path.endswith(".zst"): compression = "zstd"
+        else: compression = None
+    _require_compression(compression)
+    with open(path, "rb") as f:
+        if compression is None: lines = f
+        else: lines = _iter_lines(_iter_decompressed(f, compression))
+        for i, line in enumerate(lines):
+            if not line.endswith(b"\n"): break
+            if i >= skip: yield json.loads(line)
+
+def _iter_lines(chunks):
+    tail = b""
+    for data, end in chunks:
+        lines = (tail + data).split(b"\n")
+        tail = lines.pop()
+        for line in lines: yield line + b"\n"
@@ -0,0 +1,138 @@
+"""
+An in-process, thread-safe memoization layer for the public fetch functions.
+
+Results are kept in a bounded LRU map with a TTL. Concurrent calls with the same arguments
+are coalesced: the first caller runs the fetch, the others wait for it and share its result
+(or its exception), so a burst of identical lookups costs one request and one parse.
+It does not depend on, but can be stacked on top of, a `cache.DiskCache`.
+
+Example
+--------
+```
+import alexa
+import memo
+m = memo.Memo(maxsize=10000, ttl=600)
+get_website_info = m.wrap(alexa.get_website_info)
+info = get_website_info("example.com")
+get_website_info.invalidate("example.com")
+```
+"""
+
+import collections
+import functools
+import threading
+import time
+
+class _Call():
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.invalidated = False
+
+class Memo():
+    """
+    A memo holding at most `maxsize` results, each for at most `ttl` seconds (forever if `ttl` is None).
+    Results are shared between callers and shall be treated as read-only.
+    Exceptions are passed on to every coalesced caller but never stored.
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(fn, args, kwargs):
+        return (fn, args, tuple(sorted(kwargs.items())))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Return `fn(*args, **kwargs)`, from the memo if possible.
+        Calls with unhashable arguments bypass the memo.
+        """
+        key = self._key(fn, args, kwargs)
+        try:
+            hash(key)
+        except TypeError:
+            return fn(*args, **kwargs)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None: raise call.error
+            return call.value
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and not call.invalidated:
+                    expires = None if self._ttl is None else time.monotonic() + self._ttl
+                    self._entries[key] = (expires, call.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self._maxsize:
+                        self._entries.popitem(last=False)
+            call.event.set()
+        return call.value
+
+    def wrap(self, fn):
+        """
+        Return a memoized version of `fn`, with an `invalidate(*args, **kwargs)` method
+        dropping the result memoized for those arguments.
+        """
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.call(fn, *args, **kwargs)
+        wrapper.invalidate = lambda *args, **kwargs: self.invalidate(fn, *args, **kwargs)
+        wrapper.memo = self
+        return wrapper
+
+    def invalidate(self, fn, *args, **kwargs):
+        """
+        Drop the result memoized for `fn(*args, **kwargs)`.
+        A call for it still in flight will not be stored.
+        """
+        key = self._key(fn, args, kwargs)
+        with self._lock:
+            self._entries.pop(key, None)
+            call = self._calls.get(key)
+            if call is not None: call.invalidated = True
+
+    def clear(self):
+        """
+        Drop every memoized result.
+        """
+        with self._lock:
+            self._entries.clear()
+            for call in self._calls.values(): call.invalidated = True
+
+    def stats(self):
+        """
+        Return a dict of hit, miss and coalesced-call counters, with the number of memoized results.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "entries": len(self._entries)}
@@ -0,0 +1,245 @@
+"""
+Bulk lookups with the pages fetched by threads and parsed by a pool of processes.
+
+The parsers of `alexa` and `whois` hold the GIL, so however many threads fetch pages,
+only one of them parses at a time. A `Pipeline` runs every lookup in two stages:
+- `fetch_workers` threads download the pages and put them on a queue holding at most `queue_size` pages;
+- `processes` worker processes parse them, with at most two pages per process sent at once.
+When the parsers fall behind, the queue fills up and the fetch threads wait for room;
+when the results are not consumed, no more pages are sent to the parsers.
+Memory stays bounded whatever the length of the work list, and parsing is spread over the cores.
+The consuming thread blocks on the outcomes as they complete, and the timings measured while parsing
+in the worker processes are passed to the `instrument` hooks of this one.
+On a single CPU the pipeline is slower than the threads alone; `benchmarks/pipeline_scaling.py` measures both.
+
+Example
+--------
+```
+import pipeline
+p = pipeline.Pipeline("whois", fetch_workers=32, processes=8)
+for domain, result in p.run(open("domains.txt").read().split()):
+    print(domain, result)
+print(p.stats())
+```
+"""
+
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+import alexa
+import instrument
+import whois
+
+kinds = ("whois", "siteinfo")
+
+_sources = {"whois": "whois", "siteinfo": "alexa"}
+_calls = {"whois": "whois", "siteinfo": "alexa.siteinfo"}
+_fetchers = {"whois": whois._fetch_who_is_page, "siteinfo": alexa._fetch_website_page}
+_end = object()
+# How often the threads blocked on a queue check whether the run was stopped.
+_stop_check_interval = 0.1
+
+def _parse_page(kind, text, sections, measure):
+    # Runs in the worker processes. Return `(result, error, measurements)`, where `error` is the "not found"
+    # `ValueError` raised instead of a result, and `measurements` the `(call, phase, value)` measured while
+    # parsing when `measure` is set, for the parent process to pass to its hooks.
+    measurements = []
+    # Hooks copied from the parent into a forked process would only collect into copies of its collectors.
+    instrument.hooks[:] = [lambda call, phase, value: measurements.append((call, phase, value))] if measure else []
+    try:
+        if kind == "whois": result = whois.who_is_from_str(text)
+        else: result = alexa.get_website_info_from_str(text, sections)
+    except ValueError as e:
+        return None, e, measurements
+    return result, None, measurements
+
+class Pipeline():
+    """
+    Look up `whois.who_is` ("whois") or `alexa.get_website_info` ("siteinfo") results, depending on `kind`,
+    with `fetch_workers` fetch threads and `processes` parser processes (one per CPU by default).
+    Fetched pages wait on a queue of `queue_size` pages (four per process by default).
+    Requests are sent through the `transport.Session` `session`, or through the default one,
+    which should be given a `pool_maxsize` of at least `fetch_workers`.
+    Results found in the `cache.DiskCache` `cache` are not fetched, and the others are saved to it.
+    `sections` selects the siteinfo sections returned, as for `alexa.get_website_info` (it is ignored for "whois").
+    `mp_context` is the `multiprocessing` context used to start the processes.
+    """
+    def __init__(self, kind, fetch_workers=16, processes=None, queue_size=None, session=None, cache=None,
+            sections=None, mp_context=None):
+        if kind not in kinds: raise ValueError("Unknown lookup kind: " + str(kind))
+        if sections is not None:
+            for section in sections:
+                if section not in alexa._section_ends: raise ValueError("Unknown siteinfo section: " + str(section))
+        self.kind = kind
+        self.fetch_workers = fetch_workers
+        self.processes = processes or os.cpu_count() or 1
+        self.queue_size = queue_size or 4 * self.processes
+        self.session = session
+        self.cache = cache
+        self.sections = None if sections is None or kind != "siteinfo" else list(sections)
+        self.mp_context = mp_context
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._fetched = 0
+        self._cached = 0
+        self._parsed = 0
+        self._failed = 0
+        self._parsing = 0
+        self._blocked = 0.0
+        self._pages = None
+
+    def _fetch(self, item):
+        # Return `(item, text, outcome)`: the page `text` to parse, or None with the final `outcome`.
+        try:
+            entry = None if self.cache is None else self.cache.get(_sources[self.kind], item)
+            if entry is not None:
+                with self._lock: self._cached += 1
+                try:
+                    return item, None, alexa._select_sections(entry.value(), self.sections)
+                except ValueError as e:
+                    return item, None, e
+            with instrument.span(_calls[self.kind]):
+                text = _fetchers[self.kind](item, self.session)
+        except Exception as e:
+            with self._lock: self._failed += 1
+            return item, None, e
+        with self._lock: self._fetched += 1
+        return item, text, None
+
+    def _put(self, pages, message, stop):
+        try:
+            pages.put_nowait(message)
+            return
+        except queue.Full:
+            start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                pages.put(message, timeout=_stop_check_interval)
+                break
+            except queue.Full:
+                pass
+        with self._lock: self._blocked += time.perf_counter() - start
+
+    def _fetch_loop(self, items, pages, stop):
+        try:
+            while not stop.is_set():
+                # The work list is shared by every fetch thread.
+                with self._lock:
+                    item = next(items, _end)
+                if item is _end: break
+                self._put(pages, self._fetch(item), stop)
+        finally:
+            self._put(pages, _end, stop)
+
+    def _feed(self, executor, pages, results, slots, sections, stop):
+        # Send the fetched pages to the parser processes, with at most `2 * processes` outcomes
+        # sent and not yet consumed. Outcomes are put on `results` as they complete,
+        # so the consuming thread only ever blocks on that queue.
+        running = self.fetch_workers
+        try:
+            while running and not stop.is_set():
+                try:
+                    message = pages.get(timeout=_stop_check_interval)
+                except queue.Empty:
+                    continue
+                if message is _end:
+                    running -= 1
+                    continue
+                while not slots.acquire(timeout=_stop_check_interval):
+                    if stop.is_set(): return
+                item, text, outcome = message
+                message = None
+                if text is None:
+                    results.put((item, None, outcome))
+                    continue
+                try:
+                    future = executor.submit(_parse_page, self.kind, text, sections, bool(instrument.hooks))
+                except Exception as e:
+                    with self._lock: self._failed += 1
+                    results.put((item, None, e))
+                    continue
+                with self._lock: self._parsing += 1
+                # The page is only kept until parsed when it is to be cached.
+                if self.cache is None: text = None
+                future.add_done_callback(lambda future, item=item, text=text: results.put((item, text, future)))
+                text = None
+        finally:
+            results.put(_end)
+
+    def _outcome(self, item, text, future):
+        source = _sources[self.kind]
+        try:
+            result, error, measurements = future.result()
+        except Exception as e:
+            with self._lock: self._failed += 1
+            return e
+        for call, phase, value in measurements:
+            instrument.emit(phase, value, call)
+        if error is not None:
+            if self.cache is not None: self.cache.put(source, item, text, error=str(error))
+            return error
+        if self.cache is not None:
+            # The whole result is cached, as by `get_website_info`.
+            self.cache.put(source, item, text, result)
+            result = alexa._select_sections(result, self.sections)
+        return result
+
+    def run(self, items):
+        """
+        Look up every item of the iterable `items` (domains or websites), and yield `(item, result)` pairs
+        in completion order, where `result` is the result or the exception raised by the lookup.
+        Items are taken from `items` only as the fetch threads get to them.
+        """
+        with self._lock: self._reset_stats()
+        items = iter(items)
+        pages = queue.Queue(self.queue_size)
+        self._pages = pages
+        results = queue.Queue()
+        slots = threading.BoundedSemaphore(2 * self.processes)
+        stop = threading.Event()
+        # With the whole page cached, the sections are selected from the full result.
+        sections = self.sections if self.cache is None else None
+        executor = concurrent.futures.ProcessPoolExecutor(self.processes, mp_context=self.mp_context)
+        try:
+            # Start the processes before the threads, as forking while another thread holds a lock is unsafe.
+            executor.submit(int).result()
+            for _ in range(self.fetch_workers):
+                threading.Thread(target=self._fetch_loop, args=(items, pages, stop), daemon=True).start()
+            threading.Thread(target=self._feed, args=(executor, pages, results, slots, sections, stop),
+                daemon=True).start()
+            fed = False
+            while True:
+                with self._lock:
+                    if fed and self._parsing == 0: break
+                message = results.get()
+                if message is _end:
+                    # The outcomes of the pages being parsed are still to come.
+                    fed = True
+                    continue
+                slots.release()
+                item, text, outcome = message
+                if isinstance(outcome, concurrent.futures.Future):
+                    outcome = self._outcome(item, text, outcome)
+                    with self._lock:
+                        self._parsing -= 1
+                        self._parsed += 1
+                yield item, outcome
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            with self._lock: self._parsing = 0
+
+    def stats(self):
+        """
+        Return a dict of counters of the current (or last) run: pages fetched, results found in the cache,
+        pages parsed, failed lookups (other than "not found" ones), pages waiting on the queue and
+        being parsed, and the seconds the fetch threads spent waiting for room on the queue.
+        """
+        with self._lock:
+            return {"fetched": self._fetched, "cached": self._cached, "parsed": self._parsed,
+                "failed": self._failed, "queued": 0 if self._pages is None else self._pages.qsize(),
+                "parsing": self._parsing, "blocked": self._blocked}
@@ -0,0 +1,135 @@
+"""
+Refresh the lookups stored in a `cache.DiskCache`, without fetching or parsing the unchanged pages again.
+
+For every item, the page is requested with the validators stored with its entry
+(If-None-Match with its ETag, If-Modified-Since with its Last-Modified date):
+- a 304 Not Modified answer renews the entry, and its result is reused without downloading the page;
+- a page whose content hash matches the stored digest renews the entry, and its result is reused without parsing it;
+- any other page is parsed and stored, with its new validators.
+`Refresh.stats` counts the pages skipped either way, and the bytes not downloaded thanks to 304 answers.
+
+Example
+--------
+```
+import cache
+import refresh
+c = cache.DiskCache("lookups.sqlite")
+r = refresh.Refresh("whois", c, max_workers=16)
+for domain, result in r.run(open("domains.txt").read().split()):
+    pass
+print(r.stats()) # e.g. {"checked": 1000, "not modified": 700, "unchanged": 250, "changed": 50, ...}
+```
+"""
+
+import threading
+import requests
+import alexa
+import bulk
+import cache
+import instrument
+import transport
+import whois
+
+kinds = ("whois", "siteinfo")
+
+_sources = {"whois": "whois", "siteinfo": "alexa"}
+_calls = {"whois": "whois", "siteinfo": "alexa.siteinfo"}
+_parsers = {"whois": whois.who_is_from_str, "siteinfo": alexa._parse_website_info}
+
+def _url(kind, item):
+    if kind == "whois": return whois._whois_base_url + item
+    return alexa._siteinfo_base_url + item
+
+class Refresh():
+    """
+    Refresh the `whois.who_is` ("whois") or `alexa.get_website_info` ("siteinfo") results, depending on `kind`,
+    stored in the `cache.DiskCache` `cache`. Items missing from it are fetched, parsed and stored.
+    Requests are sent through the `transport.Session` `session`, or through the default one,
+    with at most `max_workers` at once. Pages are parsed on the consuming thread.
+    With `skip_fresh` set, unexpired entries are returned without any request.
+    `sections` selects the siteinfo sections returned, as for `alexa.get_website_info`; whole results are cached.
+    """
+    def __init__(self, kind, cache, session=None, max_workers=8, skip_fresh=False, sections=None):
+        if kind not in kinds: raise ValueError("Unknown lookup kind: " + str(kind))
+        self.kind = kind
+        self.cache = cache
+        self.session = session
+        self.max_workers = max_workers
+        self.skip_fresh = skip_fresh
+        self.sections = None if sections is None or kind != "siteinfo" else list(sections)
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def _revalidate(self, item):
+        # Runs on the fetch threads. Return `(status, entry, text, validators)`, where `text` is the page
+        # to parse for the "changed" and "new" statuses, and `entry` the cached entry to reuse otherwise.
+        source = _sources[self.kind]
+        entry = self.cache.get(source, item, expired=True)
+        if entry is not None and self.skip_fresh and not entry.expired:
+            return "fresh", entry, None, None
+        headers = {}
+        if entry is not None:
+            if entry.etag is not None: headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None: headers["If-Modified-Since"] = entry.last_modified
+        with instrument.span(_calls[self.kind]):
+            r = transport.get(_url(self.kind, item), self.session, headers=headers)
+        validators = (r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        if r.status_code == requests.codes.not_modified and entry is not None:
+            self.cache.renew(source, item, *validators)
+            self._count("bytes saved", entry.length or 0)
+            return "not modified", entry, None, None
+        if r.status_code != requests.codes.ok:
+            r.raise_for_status()
+            return None, None, None, None
+        self._count("bytes downloaded", len(r.content))
+        text = r.text
+        if entry is not None and entry.digest == cache.digest(text):
+            self.cache.renew(source, item, *validators)
+            return "unchanged", entry, None, None
+        return "new" if entry is None else "changed", None, text, validators
+
+    def _result(self, item, status, entry, text, validators):
+        if status is None: return None
+        if entry is not None:
+            self._count("skipped")
+            result = entry.value()
+        else:
+            with instrument.span(_calls[self.kind]):
+                result = self.cache.store(_sources[self.kind], item, text, _parsers[self.kind], *validators)
+        return alexa._select_sections(result, self.sections)
+
+    def run(self, items):
+        """
+        Refresh every item of the iterable `items` (domains or websites), and yield `(item, result)` pairs
+        in completion order, where `result` is the result or the exception raised by the lookup.
+        """
+        with self._lock:
+            self._counts = dict((name, 0) for name in ("checked", "fresh", "not modified", "unchanged",
+                "changed", "new", "failed", "skipped", "bytes downloaded", "bytes saved"))
+        for item, future in bulk.completed(self._revalidate, items, self.max_workers):
+            self._count("checked")
+            try:
+                status, entry, text, validators = future.result()
+                if status is not None: self._count(status)
+                result = self._result(item, status, entry, text, validators)
+            except ValueError as e:
+                result = e
+            except Exception as e:
+                self._count("failed")
+                result = e
+            yield item, result
+
+    def stats(self):
+        """
+        Return a dict of counters of the current (or last) run: items checked; entries returned unexpired
+        ("fresh"), renewed after a 304 answer ("not modified") or a matching content hash ("unchanged");
+        pages parsed as they changed ("changed") or were not cached ("new"); failed lookups;
+        results reused without parsing ("skipped"); and the bytes of pages downloaded,
+        and not downloaded thanks to 304 answers ("bytes saved").
+        """
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,202 @@
+"""
+Per-host rate limiting, retries and adaptive concurrency for the requests sent through `transport`.
+
+A `Scheduler` given to a `transport.Session` controls every request of that session:
+- each host gets a token bucket, refilled at `rate` requests per second;
+- responses with a status in `retry_statuses` (429 and 5xx by default) and connection errors are
+  retried up to `max_retries` times, after the delay in their Retry-After header if any,
+  or else a jittered exponential backoff;
+- the number of requests in flight to a host starts at `max_concurrency`, is halved on every
+  throttled or failed attempt, and grows back by one for every window of successful ones;
+  errors raised on the caller's side of `request()` (anything but a `requests` error) are not held against the host.
+
+Example
+--------
+At most 2 requests per second to each host, retried up to 5 times:
+```
+import scheduler
+import transport
+transport.configure(scheduler=scheduler.Scheduler(rate=2, max_retries=5))
+```
+"""
+
+import email.utils
+import random
+import threading
+import time
+import requests
+
+class TokenBucket():
+    """
+    A thread-safe token bucket holding up to `burst` tokens, refilled at `rate` tokens per second.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self):
+        """
+        Take a token if one is available, and return whether one was taken.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1: return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available. Return the number of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+def _retry_after(response):
+    # Seconds asked for by the Retry-After header of `response`, or None.
+    value = response.headers.get("Retry-After")
+    if value is None: return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+class _Host():
+    def __init__(self, rate, burst, max_concurrency):
+        self.bucket = None if rate is None else TokenBucket(rate, burst)
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self.condition = threading.Condition()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+class Scheduler():
+    """
+    Schedule the requests sent to each host: see the module documentation.
+    `rate` is the default number of requests per second allowed to each host (None for no limit),
+    `burst` the number of requests that can be sent at once after an idle period,
+    and `host_rates` a dict of per-host rates overriding `rate`, e.g. `{"www.whois.com": 1}`.
+    Backoff delays are drawn uniformly between 0 and `backoff_base * 2 ** attempt` seconds, capped at `backoff_max`.
+    Concurrency per host adapts between `min_concurrency` and `max_concurrency`.
+    """
+    def __init__(self, rate=None, burst=None, host_rates=None, max_retries=3, backoff_base=0.5, backoff_max=30.0,
+            retry_statuses=(429, 500, 502, 503, 504), max_concurrency=8, min_concurrency=1):
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = dict(host_rates or {})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None:
+                h = self._hosts[host] = _Host(self.host_rates.get(host, self.rate), self.burst, self.max_concurrency)
+            return h
+
+    def _enter(self, h, retry):
+        with h.condition:
+            while True:
+                wait = h.resume_at - time.monotonic()
+                if wait <= 0 and h.in_flight < int(h.limit): break
+                h.condition.wait(wait if wait > 0 else None)
+            h.in_flight += 1
+            h.requests += 1
+            if retry: h.retries += 1
+        if h.bucket is not None: h.bucket.acquire()
+
+    def _leave(self, h, status, retry_after=None):
+        # `status` is the response status code, or None after a connection error.
+        with h.condition:
+            h.in_flight -= 1
+            if status is not None and status not in self.retry_statuses:
+                h.limit = min(float(self.max_concurrency), h.limit + 1.0 / h.limit)
+            else:
+                if status == 429: h.throttled += 1
+                else: h.failures += 1
+                h.limit = max(float(self.min_concurrency), h.limit / 2)
+                if retry_after is not None:
+                    h.resume_at = max(h.resume_at, time.monotonic() + retry_after)
+            h.condition.notify_all()
+
+    def _release(self, h):
+        # Give back the slot of a request that failed on the caller's side: the host is not to blame.
+        with h.condition:
+            h.in_flight -= 1
+            h.condition.notify_all()
+
+    def backoff(self, attempt):
+        """
+        Return the jittered delay before retry number `attempt` (0 for the first retry).
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def send(self, host, request):
+        """
+        Call `request()`, which sends one request to `host` and returns its `requests.Response`,
+        under the host's rate and concurrency limits, retrying it as needed.
+        Return the last response, or raise the last connection error once the retries are exhausted.
+        """
+        h = self._host(host)
+        attempt = 0
+        while True:
+            self._enter(h, attempt > 0)
+            try:
+                r = request()
+            except (requests.ConnectionError, requests.Timeout):
+                self._leave(h, None)
+                if attempt >= self.max_retries: raise
+                delay = None
+            except requests.RequestException:
+                # Other transport errors (e.g. a truncated body) are not retried, but count against the host.
+                self._leave(h, None)
+                raise
+            except BaseException:
+                # Errors of the caller (a parse error, an interrupt, a closed generator) only give back the slot.
+                self._release(h)
+                raise
+            else:
+                delay = _retry_after(r) if r.status_code in self.retry_statuses else None
+                self._leave(h, r.status_code, delay)
+                if r.status_code not in self.retry_statuses or attempt >= self.max_retries: return r
+                r.close()
+            # With a Retry-After delay, the host itself is paused until it has elapsed.
+            if delay is None: time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def stats(self):
+        """
+        Return a dict of per-host counters: requests sent, retries, throttled (429) and failed attempts,
+        the current concurrency limit and the requests in flight.
+        """
+        with self._lock:
+            hosts = list(self._hosts.items())
+        return dict((host, {"requests": h.requests, "retries": h.retries, "throttled": h.throttled,
+            "failures": h.failures, "concurrency": int(h.limit), "in flight": h.in_flight}) for host, h in hosts)
@@ -0,0 +1,386 @@
+"""
+Sharded crawls, spread over worker processes on one or several machines.
+
+The work list of a job is partitioned into `shards` by a consistent hash of every item (`HashRing`),
+and put on a shared `WorkQueue`. Each `Worker` leases batches of items from its own shard,
+looks them up, appends the results to a JSON Lines file of its own and marks the items done.
+- A lease expires after `lease_seconds`: the items of a worker that died are leased again by another one.
+- A failed lookup is retried up to `max_attempts` times, after a backoff; "not found" results (`ValueError`) count as done.
+- Once its own shard is drained, a worker takes the items left in the other shards.
+The output files of all workers are combined by `merge`, which keeps one record per item:
+an item whose lease expired while it was being looked up may have been written twice.
+
+`SQLiteWorkQueue` is the queue built in, a SQLite file that workers on one host (or on a shared
+filesystem supporting locks) open concurrently. Other queues implement the methods of `WorkQueue`.
+
+Example
+--------
+```
+python sharding.py add crawl.sqlite whois domains.txt --shards 4
+python sharding.py work crawl.sqlite whois --fetch whois --shard 0 -o out/   # one per shard, on any host
+python sharding.py status crawl.sqlite whois
+python sharding.py merge "out/whois-*.jsonl" -o whois.jsonl
+```
+or from python:
+```
+import sharding
+queue = sharding.SQLiteWorkQueue("crawl.sqlite")
+sharding.enqueue(queue, "whois", domains, shards=4)
+worker = sharding.Worker(queue, "whois", "whois", shard=0, output="out/whois-0.jsonl")
+for domain, result in worker.run():
+    pass
+```
+"""
+
+import argparse
+import bisect
+import concurrent.futures
+import glob
+import hashlib
+import os
+import random
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import jobs
+import jsonl
+
+class HashRing():
+    """
+    A consistent hash ring over the shard names `nodes`, each placed at `replicas` points.
+    Adding or removing a shard only moves the items of the ring segments it takes or gives back.
+    """
+    def __init__(self, nodes, replicas=100):
+        self.nodes = list(nodes)
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+        for point, node in sorted((_hash("{0}#{1}".format(node, i)), node) for node in self.nodes for i in range(replicas)):
+            self._points.append(point)
+            self._owners.append(node)
+
+    def node(self, key):
+        """
+        Return the shard of `key`.
+        """
+        if not self._points: raise ValueError("The hash ring has no shard.")
+        i = bisect.bisect(self._points, _hash(key))
+        return self._owners[i % len(self._owners)]
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf8")).digest()[:8], "big")
+
+class WorkQueue():
+    """
+    The interface of the queues shared by the workers of a sharded job. Items are identified by
+    the job name and the item (a domain or website); shards are integers.
+    """
+    def add(self, job, items):
+        """
+        Add the `(item, shard)` pairs `items` to `job`, ignoring those already there. Return the number added.
+        """
+        raise NotImplementedError()
+
+    def lease(self, job, owner, shard, count, lease_seconds, steal=False):
+        """
+        Lease up to `count` items of `job` to `owner` for `lease_seconds`, and return a list of
+        `(item, attempts)` pairs, where `attempts` counts the leases of the item, this one included.
+        Items are taken from `shard`, whether pending or with an expired lease; with `steal` set,
+        from the other shards when `shard` has none left.
+        """
+        raise NotImplementedError()
+
+    def complete(self, job, owner, item, error=None):
+        """
+        Mark `item` of `job` done, with the "not found" message `error` if any.
+        """
+        raise NotImplementedError()
+
+    def complete_many(self, job, owner, outcomes):
+        """
+        Mark the items of `job` done, from the `(item, error)` pairs `outcomes`.
+        """
+        for item, error in outcomes: self.complete(job, owner, item, error)
+
+    def fail(self, job, owner, item, error, retry_after=0.0):
+        """
+        Record the failure `error` of `item` of `job`: the item is leased again after `retry_after` seconds,
+        unless it has been attempted `max_attempts` times already.
+        """
+        raise NotImplementedError()
+
+    def counts(self, job):
+        """
+        Return a dict of the number of items of `job` per status ("pending", "leased", "done", "failed").
+        """
+        raise NotImplementedError()
+
+    def failures(self, job):
+        """
+        Return a dict mapping the items of `job` that failed for good to their last error message.
+        """
+        raise NotImplementedError()
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    A `WorkQueue` stored in the SQLite database file `path`, shared by the processes opening it.
+    Items are given up after `max_attempts` leases. `timeout` is the number of seconds to wait for
+    a lock held by another process.
+    """
+    def __init__(self, path, max_attempts=3, timeout=30.0):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS work (
+            job TEXT NOT NULL,
+            item TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            owner TEXT,
+            lease_until REAL NOT NULL,
+            attempts INTEGER NOT NULL,
+            error TEXT,
+            PRIMARY KEY (job, item))""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS work_shard ON work (job, shard, status, lease_until)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self, statements):
+        # Run `statements(db)` in a write transaction, taking the database lock at once.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def add(self, job, items):
+        def statements(db):
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO work VALUES (?, ?, ?, 'pending', NULL, 0, 0, NULL)",
+                ((job, item, shard) for item, shard in items))
+            return db.total_changes - before
+        return self._transaction(statements)
+
+    def lease(self, job, owner, shard, count, lease_seconds, steal=False):
+        def statements(db):
+            now = time.time()
+            # Items whose lease expired as often as they may be attempted are given up.
+            db.execute("UPDATE work SET status = 'failed', owner = NULL, error = COALESCE(error, 'lease expired') "
+                "WHERE job = ? AND status = 'leased' AND lease_until <= ? AND attempts >= ?",
+                (job, now, self.max_attempts))
+            available = "job = ? AND status IN ('pending', 'leased') AND lease_until <= ?"
+            rows = db.execute("SELECT item, attempts FROM work WHERE " + available + " AND shard = ? LIMIT ?",
+                (job, now, shard, count)).fetchall()
+            if not rows and steal:
+                rows = db.execute("SELECT item, attempts FROM work WHERE " + available + " LIMIT ?",
+                    (job, now, count)).fetchall()
+            db.executemany("UPDATE work SET status = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE job = ? AND item = ?", ((owner, now + lease_seconds, job, item) for item, _ in rows))
+            return [(item, attempts + 1) for item, attempts in rows]
+        return self._transaction(statements)
+
+    def complete(self, job, owner, item, error=None):
+        self._transaction(lambda db: db.execute("UPDATE work SET status = 'done', owner = ?, error = ? "
+            "WHERE job = ? AND item = ?", (owner, error, job, item)))
+
+    def complete_many(self, job, owner, outcomes):
+        # One transaction for the whole batch.
+        self._transaction(lambda db: db.executemany("UPDATE work SET status = 'done', owner = ?, error = ? "
+            "WHERE job = ? AND item = ?", ((owner, error, job, item) for item, error in outcomes)))
+
+    def fail(self, job, owner, item, error, retry_after=0.0):
+        self._transaction(lambda db: db.execute("UPDATE work SET status = CASE WHEN attempts >= ? "
+            "THEN 'failed' ELSE 'pending' END, owner = NULL, lease_until = ?, error = ? "
+            "WHERE job = ? AND item = ? AND status = 'leased'",
+            (self.max_attempts, time.time() + retry_after, error, job, item)))
+
+    def counts(self, job):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM work WHERE job = ? GROUP BY status", (job,)))
+        return dict((status, counts.get(status, 0)) for status in ("pending", "leased", "done", "failed"))
+
+    def failures(self, job):
+        with self._lock:
+            return dict(self._db.execute("SELECT item, error FROM work WHERE job = ? AND status = 'failed'", (job,)))
+
+def default_name():
+    """
+    Return the default worker name: the host name and the process id.
+    """
+    return "{0}:{1}".format(socket.gethostname(), os.getpid())
+
+def enqueue(queue, job, items, shards):
+    """
+    Add the items of the iterable `items` to `job` on the `WorkQueue` `queue`, partitioned into
+    `shards` shards (numbered from 0) by a `HashRing`. Return the number of items added.
+    """
+    ring = HashRing(range(shards))
+    return queue.add(job, ((item, ring.node(item)) for item in items))
+
+class Worker():
+    """
+    A worker of the sharded `job` on the `WorkQueue` `queue`, looking up the items of `shard` with `fetch`,
+    which is either a function of one item or the name of one of `jobs.fetchers` ("whois", "siteinfo" or "topsites").
+    Results are appended to the JSON Lines file `output`, as by `jsonl.JSONLinesWriter.write_all`.
+    Items are leased `batch_size` at a time for `lease_seconds`, which should cover the lookup of a whole batch,
+    and looked up by `max_workers` threads. Failed lookups are retried after a jittered backoff
+    of up to `backoff_base * 2 ** attempts` seconds. With `steal` set, the worker helps with
+    the other shards once its own is drained. `name` identifies the worker, by host and process id by default.
+    """
+    def __init__(self, queue, job, fetch, shard, output, name=None, batch_size=32, lease_seconds=300.0,
+            max_workers=8, steal=True, backoff_base=1.0, poll_interval=1.0):
+        self.queue = queue
+        self.job = job
+        self.fetch = jobs.fetchers[fetch] if isinstance(fetch, str) else fetch
+        self.shard = shard
+        self.output = output
+        self.name = name or default_name()
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_workers = max_workers
+        self.steal = steal
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._done = 0
+        self._failed = 0
+        self._batches = 0
+
+    def _lookups(self, executor, leased):
+        futures = dict((executor.submit(self.fetch, item), (item, attempts)) for item, attempts in leased)
+        for future in concurrent.futures.as_completed(futures):
+            item, attempts = futures[future]
+            try:
+                yield item, attempts, future.result()
+            except Exception as e:
+                yield item, attempts, e
+
+    def run(self):
+        """
+        Work until no item of the job is pending or leased, and yield `(item, result)` pairs in completion order,
+        where `result` is the fetched result or the exception raised by `fetch`.
+        Outputs are flushed, and items marked done, once per batch.
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(self.max_workers)
+        try:
+            with jsonl.JSONLinesWriter(self.output, resume=True) as writer:
+                while True:
+                    leased = self.queue.lease(self.job, self.name, self.shard, self.batch_size, self.lease_seconds,
+                        self.steal)
+                    if not leased:
+                        counts = self.queue.counts(self.job)
+                        if counts["pending"] == 0 and counts["leased"] == 0: break
+                        # Wait for the retries and the leases of other workers.
+                        time.sleep(self.poll_interval)
+                        continue
+                    outcomes = []
+                    for item, attempts, result in self._lookups(executor, leased):
+                        if isinstance(result, Exception) and not isinstance(result, ValueError):
+                            self.queue.fail(self.job, self.name, item, repr(result),
+                                random.uniform(0, self.backoff_base * 2 ** attempts))
+                            with self._lock: self._failed += 1
+                        else:
+                            writer.write_all([(item, result)])
+                            outcomes.append((item, str(result) if isinstance(result, ValueError) else None))
+                        yield item, result
+                    # Results reach the output before their items are marked done: a crash in between
+                    # leaves duplicates for `merge` to drop, never lost results.
+                    writer.flush()
+                    self.queue.complete_many(self.job, self.name, outcomes)
+                    with self._lock:
+                        self._done += len(outcomes)
+                        self._batches += 1
+        finally:
+            executor.shutdown(wait=False)
+
+    def stats(self):
+        """
+        Return a dict of the items done and failed attempts by this worker, and the batches it completed.
+        """
+        with self._lock:
+            return {"done": self._done, "failed": self._failed, "batches": self._batches}
+
+def merge(inputs, output, compression=None):
+    """
+    Combine the JSON Lines files `inputs` written by the workers of a job into `output`,
+    keeping the first record of every item. Return the number of records written.
+    """
+    seen = set()
+    with jsonl.JSONLinesWriter(output, compression) as writer:
+        for path in inputs:
+            for record in jsonl.read(path):
+                if record["key"] in seen: continue
+                seen.add(record["key"])
+                writer.write(record)
+    return len(seen)
+
+def _read_items(path):
+    f = sys.stdin if path == "-" else open(path, encoding="utf8")
+    try:
+        return [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin: f.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run sharded whois.com and alexa.com crawls over several workers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="add items to a job")
+    add.add_argument("queue", help="SQLite work queue file")
+    add.add_argument("job", help="job name")
+    add.add_argument("items", help="file of items, one per line (- for standard input)")
+    add.add_argument("--shards", type=int, required=True, help="number of shards")
+    work = commands.add_parser("work", help="work on a job until it is drained")
+    work.add_argument("queue", help="SQLite work queue file")
+    work.add_argument("job", help="job name")
+    work.add_argument("--fetch", choices=sorted(jobs.fetchers), required=True, help="lookup to run")
+    work.add_argument("--shard", type=int, required=True, help="shard of this worker")
+    work.add_argument("-o", "--output", default=".", help="directory of the output files")
+    work.add_argument("--name", help="worker name (default: host:pid)")
+    work.add_argument("--batch-size", type=int, default=32)
+    work.add_argument("--lease", type=float, default=300.0, help="lease duration in seconds")
+    work.add_argument("--max-workers", type=int, default=8, help="lookup threads")
+    work.add_argument("--max-attempts", type=int, default=3)
+    work.add_argument("--no-steal", action="store_true", help="only work on the own shard")
+    status = commands.add_parser("status", help="print the item counts of a job")
+    status.add_argument("queue", help="SQLite work queue file")
+    status.add_argument("job", help="job name")
+    merging = commands.add_parser("merge", help="merge the output files of the workers")
+    merging.add_argument("inputs", nargs="+", help="output files or glob patterns")
+    merging.add_argument("-o", "--output", required=True, help="merged .jsonl file")
+    args = parser.parse_args(argv)
+
+    if args.command == "merge":
+        inputs = [path for pattern in args.inputs for path in sorted(glob.glob(pattern)) or [pattern]]
+        print("{0} records".format(merge(inputs, args.output)), file=sys.stderr)
+        return
+    with SQLiteWorkQueue(args.queue, max_attempts=getattr(args, "max_attempts", 3)) as queue:
+        if args.command == "add":
+            print("{0} items added".format(enqueue(queue, args.job, _read_items(args.items), args.shards)), file=sys.stderr)
+        elif args.command == "status":
+            print(queue.counts(args.job))
+        else:
+            name = args.name or default_name()
+            output = os.path.join(args.output, "{0}-{1}-{2}.jsonl".format(args.job, args.shard, name.replace(":", "-")))
+            worker = Worker(queue, args.job, args.fetch, args.shard, output, name, args.batch_size, args.lease,
+                args.max_workers, not args.no_steal)
+            for _ in worker.run(): pass
+            print(worker.stats(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Helpers used to feed HTML pages to the parsers of `alexa` and `whois` chunk by chunk,
+as they are downloaded or read from disk, instead of as one string.
+"""
+
+import codecs
+import mmap
+import os
+import time
+import backend
+import instrument
+
+_chunk_size = 16 * 1024
+
+def iter_response_text(response, chunk_size=_chunk_size):
+    """
+    Yield the body of the streamed `requests.Response` `response` as decoded text chunks.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    if instrument.hooks: chunks = _timed_chunks(response.iter_content(chunk_size))
+    else: chunks = response.iter_content(chunk_size)
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text: yield text
+    text = decoder.decode(b"", True)
+    if text: yield text
+
+def _timed_chunks(chunks):
+    # Only the time spent waiting for the chunks counts as "download", not the time spent parsing them.
+    elapsed = 0.0
+    size = 0
+    chunks = iter(chunks)
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            elapsed += time.perf_counter() - start
+            if chunk is None: break
+            size += len(chunk)
+            yield chunk
+    finally:
+        instrument.emit("download", elapsed)
+        instrument.emit("bytes", size)
+
+def iter_file_text(file_name, chunk_size=_chunk_size, encoding="utf8"):
+    """
+    Yield the content of the text file `file_name` in chunks of `chunk_size` characters.
+    """
+    with open(file_name, 'r', encoding=encoding) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk: break
+            yield chunk
+
+def iter_mmap_text(file_name, chunk_size=_chunk_size, encoding="utf8"):
+    """
+    Yield the content of the text file `file_name` in decoded chunks of `chunk_size` bytes,
+    read from a memory map of the file, so the whole file is never copied into memory.
+    """
+    with open(file_name, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0: return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)()
+                for i in range(0, size, chunk_size):
+                    text = decoder.decode(view[i:i+chunk_size])
+                    if text: yield text
+                text = decoder.decode(b"", True)
+                if text: yield text
+            finally:
+                view.release()
+
+def feed(parser, chunks):
+    """
+    Feed the text chunks `chunks` to `parser`, stopping as soon as `parser.done` is set.
+    Return whether the parser finished early.
+
+    `html.parser.HTMLParser` hands a text node cut across two `feed` calls to `handle_data` in two pieces,
+    so chunks are cut right before a "<" and the parser sees the same text nodes as for the whole page.
+    """
+    tail = ""
+    for chunk in chunks:
+        tail += chunk
+        cut = tail.rfind("<")
+        if cut > 0:
+            parser.feed(tail[:cut])
+            tail = tail[cut:]
+            if parser.done: return True
+    if tail: parser.feed(tail)
+    return parser.done
+
+def parse(handler, chunks):
+    """
+    Feed the text chunks `chunks` to the parser `handler` through the current `backend`,
+    stopping as soon as it is done.
+    """
+    f = backend.feeder(handler)
+    if instrument.hooks: f = _TimedFeeder(f)
+    feed(f, chunks)
+    f.finish()
+    return handler
+
+class _TimedFeeder():
+    # Adds up the time spent in the feeder, and emits it as "parse" once finished.
+    def __init__(self, feeder):
+        self._feeder = feeder
+        self._elapsed = 0.0
+
+    @property
+    def done(self):
+        return self._feeder.done
+
+    def feed(self, data):
+        start = time.perf_counter()
+        self._feeder.feed(data)
+        self._elapsed += time.perf_counter() - start
+
+    def finish(self):
+        start = time.perf_counter()
+        self._feeder.finish()
+        instrument.emit("parse", self._elapsed + time.perf_counter() - start)
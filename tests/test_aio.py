@@ -0,0 +1,44 @@
+import asyncio
+import concurrent.futures
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+import stub_server
+import aio
+import whois
+
+class _Counting(concurrent.futures.ThreadPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return concurrent.futures.ThreadPoolExecutor.submit(self, *args, **kwargs)
+
+class ClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = stub_server.StubServer()
+        self.server.start()
+        self.restore = stub_server.redirect(self.server.base_url)
+
+    def tearDown(self):
+        self.restore()
+        self.server.stop()
+
+    def _who_is(self, executor=None):
+        async def lookups():
+            async with aio.Client(executor=executor) as client:
+                return await asyncio.gather(client.who_is("example.com"), client.who_is("google.com"))
+        return asyncio.run(lookups())
+
+    def test_pages_are_parsed_off_the_loop(self):
+        expected = [whois.who_is("example.com"), whois.who_is("google.com")]
+        self.assertEqual(self._who_is(), expected)
+        with _Counting(1) as executor:
+            self.assertEqual(self._who_is(executor), expected)
+        self.assertEqual(executor.submitted, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import awis_via_auth
+import transport
+
+class _Session(transport.Session):
+    closed = False
+
+    def close(self):
+        self.closed = True
+        transport.Session.close(self)
+
+class AwisClientTest(unittest.TestCase):
+    def test_own_session_is_closed(self):
+        session_class = transport.Session
+        transport.Session = _Session
+        try:
+            client = awis_via_auth.AwisClient("id", "secret")
+        finally:
+            transport.Session = session_class
+        with client:
+            self.assertIsInstance(client.session, _Session)
+        self.assertTrue(client.session.closed)
+
+    def test_given_session_is_left_open(self):
+        session = _Session()
+        with awis_via_auth.AwisClient("id", "secret", session=session):
+            pass
+        self.assertFalse(session.closed)
+        session.close()
+
+if __name__ == "__main__":
+    unittest.main()
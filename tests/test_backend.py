@@ -0,0 +1,92 @@
+import html.parser
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import alexa
+import backend
+import whois
+
+# Malformed markup on which libxml2 and html.parser report different events.
+_malformed = {
+    "unclosed li": '<ul><li class="site-listing">one<li class="site-listing">two</ul>',
+    "unclosed p": "<div><p>first<p>second</div>",
+    "br": "<div>Name Server: a<br/>Name Server: b<br>DNSSEC: unsigned</div>",
+    "misnested": "<b><i>bold italic</b> italic</i> plain",
+    "valueless attribute": '<input disabled><option selected value="x">',
+}
+
+_whois_page = ('<html><body><div class="whois_result" id="registryData">Domain Name: EXAMPLE.COM<br/>'
+    'Name Server: A.IANA-SERVERS.NET<br/>Name Server: B.IANA-SERVERS.NET<br/>DNSSEC: signedDelegation</div>'
+    '<div class="whois_result" id="registrarData">Registrar: RESERVED-Internet Assigned Numbers Authority<br/>'
+    'Registrant Organization: IANA<br>DNSSEC: signedDelegation</div></body></html>')
+
+_topsites_page = ('<ul><li class="site-listing"><div class="count">1</div><a href="/siteinfo/a.com">a.com</a>'
+    '<div class="description">first</div><li class="site-listing"><div class="count">2</div>'
+    '<a href="/siteinfo/b.com">b.com</a><div class="description">second</div></li></ul>')
+
+class _Recorder(html.parser.HTMLParser):
+    def __init__(self):
+        html.parser.HTMLParser.__init__(self)
+        self.events = []
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(("start", tag, attrs))
+
+    def handle_endtag(self, tag):
+        self.events.append(("end", tag))
+
+    def handle_data(self, data):
+        self.events.append(("data", data))
+
+def _events(markup):
+    recorder = _Recorder()
+    backend.parse(recorder, markup)
+    return recorder.events
+
+def _reference_events(markup):
+    recorder = _Recorder()
+    recorder.feed(markup)
+    recorder.close()
+    return recorder.events
+
+class BackendTest(unittest.TestCase):
+    def tearDown(self):
+        backend.set_backend("stdlib")
+
+    def test_default_is_stdlib(self):
+        # Installing lxml must not change results by itself.
+        self.assertEqual(backend._backend, "stdlib")
+        self.assertEqual(backend.get_backend(), "stdlib")
+
+    def test_default_events_on_malformed_markup(self):
+        for name, markup in _malformed.items():
+            with self.subTest(name):
+                self.assertEqual(_events(markup), _reference_events(markup))
+
+    def test_default_results_on_malformed_pages(self):
+        p = whois.WhoIsHTMLParser()
+        p.feed(_whois_page)
+        p.close()
+        self.assertEqual(whois.who_is_from_str(_whois_page), p.data)
+        page = {}
+        p = alexa._AlexaTopSiteHTMLParser(page)
+        p.feed(_topsites_page)
+        p.close()
+        self.assertEqual(alexa._parse_topsite_page(_topsites_page), page["list"])
+        self.assertEqual(len(page["list"]), 1)
+
+    @unittest.skipUnless("lxml" in backend.available_backends(), "lxml is not installed")
+    def test_lxml_is_opt_in(self):
+        # The differences documented in `backend` are why lxml is only used when selected.
+        backend.set_backend("auto")
+        self.assertEqual(backend.get_backend(), "lxml")
+        self.assertNotEqual(_events(_malformed["unclosed li"]), _reference_events(_malformed["unclosed li"]))
+        self.assertEqual(len(alexa._parse_topsite_page(_topsites_page)), 2)
+        backend.set_backend("stdlib")
+        self.assertEqual(_events(_malformed["unclosed li"]), _reference_events(_malformed["unclosed li"]))
+        self.assertEqual(len(alexa._parse_topsite_page(_topsites_page)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+import backend
+import suite
+
+class CompareTest(unittest.TestCase):
+    def test_baseline_of_another_backend_is_not_compared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            with open(path, "w", encoding="utf8") as f:
+                json.dump({"backend": "lxml", "metrics": {}}, f)
+            # Returns before running the suite.
+            self.assertEqual(suite.main(["--compare", path]), 2)
+        self.assertEqual(backend.get_backend(), "stdlib")
+
+    def test_saved_baseline_matches_the_default_backend(self):
+        with open(suite._baseline, encoding="utf8") as f:
+            self.assertEqual(json.load(f).get("backend", "stdlib"), backend.get_backend())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+import alexa
+import bulk
+import cache
+import stub_server
+import whois
+
+class OutcomesTest(unittest.TestCase):
+    def test_results_and_exceptions(self):
+        def call(n):
+            if n % 3 == 0: raise ValueError(n)
+            return n * 2
+        results = dict(bulk.outcomes(call, range(10), max_workers=3))
+        self.assertEqual(sorted(results), list(range(10)))
+        for n, result in results.items():
+            if n % 3 == 0: self.assertIsInstance(result, ValueError)
+            else: self.assertEqual(result, n * 2)
+
+    def test_items_are_taken_as_calls_complete(self):
+        taken = []
+        release = threading.Event()
+        def items():
+            for n in range(100):
+                taken.append(n)
+                yield n
+        def call(n):
+            release.wait(5)
+            return n
+        results = bulk.outcomes(call, items(), max_workers=2, window=4)
+        release.set()
+        first = next(results)
+        self.assertLessEqual(len(taken), 5)
+        results.close()
+        self.assertIn(first[0], range(5))
+
+    def test_cached_items_are_not_submitted(self):
+        called = []
+        def call(n):
+            called.append(n)
+            return n
+        cached = lambda n: bulk.finished(lambda: -n) if n % 2 == 0 else None
+        self.assertEqual(dict(bulk.outcomes(call, range(6), max_workers=2, cached=cached)),
+            {0: 0, 1: 1, 2: -2, 3: 3, 4: -4, 5: 5})
+        self.assertEqual(sorted(called), [1, 3, 5])
+
+class BulkLookupsTest(unittest.TestCase):
+    def test_who_is_many_with_a_cache(self):
+        with tempfile.TemporaryDirectory() as directory, stub_server.StubServer() as server:
+            restore = stub_server.redirect(server.base_url)
+            c = cache.DiskCache(os.path.join(directory, "lookups.sqlite"))
+            try:
+                domains = ["example.com", "google.com", "notfound.invalid"]
+                first = dict(whois.who_is_many(domains, max_workers=2, cache=c))
+                requests = server.requests
+                second = dict(whois.who_is_many(domains, max_workers=2, cache=c))
+            finally:
+                c.close()
+                restore()
+        self.assertEqual(server.requests, requests)
+        self.assertEqual(first["google.com"], second["google.com"])
+        self.assertIsInstance(second["notfound.invalid"], ValueError)
+
+    def test_topsites_by_categories(self):
+        with stub_server.StubServer() as server:
+            restore = stub_server.redirect(server.base_url)
+            try:
+                results = dict(alexa.get_topsites_by_categories(["Arts"], max_in_flight=2))
+                expected = alexa.get_topsites_by_category("Arts")
+            finally:
+                restore()
+        self.assertTrue(expected)
+        self.assertEqual(results, {"Arts": expected})
+
+if __name__ == "__main__":
+    unittest.main()
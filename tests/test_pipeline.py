@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cache
+import instrument
+import pipeline
+import whois
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks", "fixtures", "whois")
+
+def _fixture_page(domain, session=None):
+    with open(os.path.join(_fixtures_dir, domain + ".html"), encoding="utf8") as f:
+        return f.read()
+
+class _Recording(pipeline.Pipeline):
+    def _outcome(self, item, text, future):
+        self.texts.append(text)
+        return pipeline.Pipeline._outcome(self, item, text, future)
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self._fetch = pipeline._fetchers["whois"]
+        pipeline._fetchers["whois"] = _fixture_page
+
+    def tearDown(self):
+        pipeline._fetchers["whois"] = self._fetch
+
+    def _run(self, disk_cache=None):
+        p = _Recording("whois", fetch_workers=2, processes=1, cache=disk_cache)
+        p.texts = []
+        results = dict(p.run(["example.com", "google.com", "notfound.invalid"]))
+        self.assertEqual(results["example.com"], whois.who_is_from_str(_fixture_page("example.com")))
+        self.assertIsInstance(results["notfound.invalid"], ValueError)
+        return p.texts
+
+    def test_pages_are_not_kept_without_a_cache(self):
+        self.assertEqual(self._run(), [None] * 3)
+
+    def test_pages_are_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            c = cache.DiskCache(os.path.join(directory, "lookups.sqlite"))
+            texts = self._run(c)
+            self.assertEqual(sorted(texts), sorted(_fixture_page(d) for d in ("example.com", "google.com",
+                "notfound.invalid")))
+            self.assertIsNotNone(c.get("whois", "google.com"))
+            c.close()
+
+    def test_parse_timings_reach_the_hooks(self):
+        collector = instrument.Collector()
+        instrument.add_hook(collector)
+        try:
+            results = list(pipeline.Pipeline("whois", fetch_workers=2, processes=1).run(["example.com", "google.com"]))
+        finally:
+            instrument.remove_hook(collector)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(collector.summary()["whois"]["parse"]["count"], 2)
+
+    def test_closing_the_run_stops_it(self):
+        p = pipeline.Pipeline("whois", fetch_workers=2, processes=1)
+        results = p.run(["example.com"] * 50)
+        next(results)
+        start = time.perf_counter()
+        results.close()
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(p.stats()["parsing"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
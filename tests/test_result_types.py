@@ -0,0 +1,69 @@
+import glob
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import alexa
+import whois
+
+_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks", "fixtures")
+
+def _results(kind, parse):
+    results = []
+    for page in sorted(glob.glob(os.path.join(_fixtures_dir, kind, "*.html"))):
+        with open(page, encoding="utf8") as f:
+            try:
+                results.append(parse(f.read()))
+            except ValueError:
+                pass
+    return results
+
+class SiteInfoTest(unittest.TestCase):
+    def test_round_trip_of_fixtures(self):
+        results = _results("siteinfo", alexa.get_website_info_from_str)
+        self.assertTrue(results)
+        for result in results:
+            info = alexa.SiteInfo.from_dict(result)
+            self.assertEqual(info.to_dict().keys(), result.keys())
+            self.assertEqual(alexa.SiteInfo.from_dict(info.to_dict()), info)
+            self.assertEqual(alexa.SiteInfo.from_dict(info.to_dict()).to_dict(), info.to_dict())
+
+    def test_to_dict_is_normalized(self):
+        info = alexa.SiteInfo.from_dict({"rank": {"global": "1,234"}, "user engagement": {"bounce rate": "38.20%"},
+            "visitor by country": [{"country": "India", "percentage": "12.30%", "rank in country": "n/a"}]})
+        self.assertEqual(info.global_rank, 1234)
+        self.assertEqual(info.bounce_rate, 38.2)
+        self.assertIsNone(info.visitors_by_country[0].rank)
+        self.assertEqual(info.to_dict(), {"rank": {"global": "1,234", "local": "-"},
+            "user engagement": {"bounce rate": "38.2%", "daily pageviews per visitor": "-", "daily time on site": "-"},
+            "visitor by country": [{"country": "India", "percentage": "12.3%", "rank in country": "-"}]})
+
+class TopSiteEntryTest(unittest.TestCase):
+    def test_round_trip_of_fixtures(self):
+        for page in sorted(glob.glob(os.path.join(_fixtures_dir, "topsites", "*", "*.html"))):
+            with open(page, encoding="utf8") as f:
+                try:
+                    entries = alexa._parse_topsite_page(f.read())
+                except IndexError:
+                    # Past the last page of the category.
+                    continue
+            for entry in entries:
+                self.assertEqual(alexa.TopSiteEntry.from_dict(entry).to_dict(), entry)
+
+class WhoIsRecordTest(unittest.TestCase):
+    def test_round_trip_of_fixtures(self):
+        results = _results("whois", whois.who_is_from_str)
+        self.assertTrue(results)
+        for result in results:
+            record = whois.WhoIsRecord.from_dict(result)
+            self.assertEqual(whois.WhoIsRecord.from_dict(record.to_dict()), record)
+            self.assertEqual(record.to_dict().keys(), result.keys())
+
+    def test_name_servers_are_a_list(self):
+        record = whois.WhoIsRecord.from_dict({"Name Server": "A.IANA-SERVERS.NET"})
+        self.assertEqual(record.name_servers, ["A.IANA-SERVERS.NET"])
+        self.assertEqual(record.to_dict(), {"Name Server": ["A.IANA-SERVERS.NET"]})
+
+if __name__ == "__main__":
+    unittest.main()
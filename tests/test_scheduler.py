@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import requests
+import scheduler
+
+class _Response():
+    status_code = 200
+    headers = {}
+
+    def close(self):
+        pass
+
+class SendTest(unittest.TestCase):
+    def _send_in_thread(self, s, request):
+        # Return the outcome of `s.send`, or None if it is still blocked after a second.
+        outcome = []
+        t = threading.Thread(target=lambda: outcome.append(s.send("example.com", request)), daemon=True)
+        t.start()
+        t.join(1.0)
+        return outcome[0] if outcome else None
+
+    def test_error_not_retried_releases_the_slot(self):
+        s = scheduler.Scheduler(max_concurrency=1)
+        def broken():
+            raise requests.exceptions.ChunkedEncodingError("truncated body")
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            s.send("example.com", broken)
+        self.assertEqual(s.stats()["example.com"]["in flight"], 0)
+        response = _Response()
+        self.assertIs(self._send_in_thread(s, lambda: response), response)
+
+    def test_interrupt_releases_the_slot(self):
+        s = scheduler.Scheduler(max_concurrency=1)
+        def interrupted():
+            raise KeyboardInterrupt()
+        with self.assertRaises(KeyboardInterrupt):
+            s.send("example.com", interrupted)
+        self.assertEqual(s.stats()["example.com"]["in flight"], 0)
+
+    def test_caller_errors_leave_the_host_limit_alone(self):
+        s = scheduler.Scheduler(max_concurrency=4)
+        def unparsable():
+            raise ValueError("not a whois page")
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                s.send("example.com", unparsable)
+        stats = s.stats()["example.com"]
+        self.assertEqual((stats["concurrency"], stats["failures"], stats["in flight"]), (4, 0, 0))
+
+    def test_transport_errors_lower_the_host_limit(self):
+        s = scheduler.Scheduler(max_concurrency=4)
+        def broken():
+            raise requests.exceptions.ChunkedEncodingError("truncated body")
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            s.send("example.com", broken)
+        stats = s.stats()["example.com"]
+        self.assertEqual((stats["concurrency"], stats["failures"]), (2, 1))
+
+    def test_connection_errors_are_retried(self):
+        s = scheduler.Scheduler(max_retries=2, backoff_base=0)
+        attempts = []
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3: raise requests.ConnectionError("reset")
+            return _Response()
+        self.assertEqual(s.send("example.com", flaky).status_code, 200)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(s.stats()["example.com"]["in flight"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+import alexa
+import instrument
+import stub_server
+
+class SectionGapTest(unittest.TestCase):
+    def test_spread_pages_parse_the_same(self):
+        for site in ("python.org", "wikipedia.org", "example.com"):
+            with open(os.path.join(stub_server._fixtures_dir, "siteinfo", site + ".html"), "rb") as f: page = f.read()
+            spread = stub_server.spread_sections(page, 32 * 1024)
+            self.assertGreater(len(spread), len(page) + 6 * 32 * 1024)
+            self.assertEqual(alexa.get_website_info_from_str(spread.decode("utf8")),
+                alexa.get_website_info_from_str(page.decode("utf8")))
+
+    def test_selected_sections_stop_the_download_early(self):
+        read = {}
+        with stub_server.StubServer(section_gap=32 * 1024) as server:
+            restore = stub_server.redirect(server.base_url)
+            try:
+                for sections in (None, ["rank"]):
+                    collector = instrument.Collector()
+                    instrument.add_hook(collector)
+                    try:
+                        alexa.get_website_info("python.org", stream=True, sections=sections)
+                    finally:
+                        instrument.remove_hook(collector)
+                    read[sections is None] = collector.summary()["alexa.siteinfo"]["bytes"]["sum"]
+            finally:
+                restore()
+        self.assertLess(read[False] * 4, read[True])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import whois_alexa
+
+class OptionsTest(unittest.TestCase):
+    def _error(self, argv):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as raised:
+            whois_alexa.main(argv)
+        self.assertEqual(raised.exception.code, 2)
+        return stderr.getvalue()
+
+    def test_ignored_options_are_rejected(self):
+        rejected = [
+            (["whois", "--sections", "rank"], "--sections only applies to siteinfo"),
+            (["topsites", "--sections", "rank"], "--sections only applies to siteinfo"),
+            (["whois", "--stream"], "--stream only applies to siteinfo"),
+            (["siteinfo", "--stream", "--processes", "2"], "--stream cannot be used with --processes"),
+            (["siteinfo", "--stream", "--cache-dir", "cache"], "--stream cannot be used with --cache-dir"),
+            (["siteinfo", "--stream", "--refresh", "--cache-dir", "cache"], "--stream cannot be used with --cache-dir"),
+            (["siteinfo", "--refresh"], "--refresh needs --cache-dir"),
+            (["whois", "--refresh", "--cache-dir", "cache", "--processes", "2"], "--refresh cannot be used with --processes"),
+            (["topsites", "--processes", "2"], "--processes does not apply to topsites"),
+            (["topsites", "--cache-dir", "cache"], "--cache-dir does not apply to topsites"),
+        ]
+        for argv, message in rejected:
+            with self.subTest(" ".join(argv)):
+                self.assertIn(message, self._error(argv))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+The shared HTTP transport used by modules `alexa`, `whois` and `awis_via_auth`.
+
+Every fetch function in those modules accepts a `session` argument.
+When it is omitted, the default session returned by `get_default_session` is used,
+so repeated lookups reuse keep-alive connections instead of opening a new one each time.
+
+Example
+--------
+Use bigger per-host pools and a shorter timeout for every lookup:
+```
+import transport
+transport.configure(pool_maxsize=32, timeout=10)
+```
+"""
+
+import threading
+import time
+import urllib.parse as urlparse
+import requests
+import requests.adapters
+import urllib3.connection
+import urllib3.connectionpool
+import instrument
+
+class _HTTPConnection(urllib3.connection.HTTPConnection):
+    def connect(self):
+        if not instrument.hooks: return urllib3.connection.HTTPConnection.connect(self)
+        start = time.perf_counter()
+        urllib3.connection.HTTPConnection.connect(self)
+        instrument.emit("connect", time.perf_counter() - start)
+
+class _HTTPSConnection(urllib3.connection.HTTPSConnection):
+    def connect(self):
+        if not instrument.hooks: return urllib3.connection.HTTPSConnection.connect(self)
+        start = time.perf_counter()
+        urllib3.connection.HTTPSConnection.connect(self)
+        instrument.emit("connect", time.perf_counter() - start)
+
+class _HTTPConnectionPool(urllib3.connectionpool.HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+class _HTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+class _Adapter(requests.adapters.HTTPAdapter):
+    # Opens connections that report their connect time to `instrument`.
+    def init_poolmanager(self, *args, **kwargs):
+        requests.adapters.HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+class Session(requests.Session):
+    """
+    A `requests.Session` with pooled keep-alive connections and a default timeout.
+    `pool_connections` is the number of hosts to keep a connection pool for,
+    `pool_maxsize` the number of connections kept open to each host, and
+    `timeout` the number of seconds applied to requests not given an explicit one.
+    Responses are requested with gzip/deflate content encoding.
+    With a `scheduler.Scheduler` given as `scheduler`, requests are rate limited and retried per host.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, timeout=30, max_retries=0, scheduler=None):
+        requests.Session.__init__(self)
+        self.timeout = timeout
+        self.scheduler = scheduler
+        adapter = _Adapter(pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize, max_retries=max_retries)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def request(self, method, url, **kwargs):
+        if "timeout" not in kwargs: kwargs["timeout"] = self.timeout
+        if self.scheduler is None: return requests.Session.request(self, method, url, **kwargs)
+        return self.scheduler.send(urlparse.urlsplit(url).netloc,
+            lambda: requests.Session.request(self, method, url, **kwargs))
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def get_default_session():
+    """
+    Return the session used by fetch functions that are not given one, creating it on first use.
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = Session()
+        return _default_session
+
+def set_default_session(session):
+    """
+    Replace the default session with `session`, closing the previous one.
+    """
+    global _default_session
+    with _default_session_lock:
+        old, _default_session = _default_session, session
+    if old is not None and old is not session: old.close()
+
+def configure(**kwargs):
+    """
+    Replace the default session with a new `Session` built from `kwargs`.
+    """
+    set_default_session(Session(**kwargs))
+
+def get(url, session=None, **kwargs):
+    """
+    Send a GET request for `url` through `session`, or through the default session if it is None.
+    """
+    if session is None: session = get_default_session()
+    if not instrument.hooks: return session.get(url, **kwargs)
+    start = time.perf_counter()
+    r = session.get(url, **kwargs)
+    ttfb = r.elapsed.total_seconds()
+    instrument.emit("ttfb", ttfb)
+    if not kwargs.get("stream", False):
+        # A streamed body is measured by `streaming.iter_response_text` as it is read.
+        instrument.emit("download", max(0.0, time.perf_counter() - start - ttfb))
+        instrument.emit("bytes", len(r.content))
+    return r
@@ -23,6 +23,15 @@ import requests
 import json
 import io
 import html.parser
+import threading
+import urllib.parse as urlparse
+import bulk
+import transport
+import streaming
+import backend
+import instrument
+
+_whois_base_url = "http://www.whois.com/whois/"
 
 # def search_via_json_whois(domain_name):
 #     headers = {
@@ -36,22 +45,49 @@ import html.parser
 def save_json_to_file(json_object, file_name):
     """
     Save a json-compatible object `json_object` as a .json file with name specified as `file_name`.
+    To save bulk results as they arrive, use a `jsonl.JSONLinesWriter` instead.
     """
     if file_name.rsplit(".")[-1] != "json": file_name += ".json"
-    f = io.FileIO(file_name, 'w')
-    f.write(json.dumps(json_object, indent=2).encode())
-    f.close()
+    with instrument.timer("serialize", "json"):
+        f = io.FileIO(file_name, 'w')
+        size = f.write(json.dumps(json_object, indent=2).encode())
+        f.close()
+    if instrument.hooks: instrument.emit("serialized bytes", size, "json")
 
 class WhoIsHTMLParser(html.parser.HTMLParser):
     """
     The derived HTML parser used to fetch data from the returned HTML page.
     User of this module shall not bother with this class.
+    With `stop_early` set, the parser stops tokenizing as soon as both the registry and
+    the registrar blocks have been consumed, and `done` is set.
     """
-    def __init__(self):
+    def __init__(self, stop_early=False):
         self._status = 0
+        self._stop_early = stop_early
+        self._registry_done = False
+        self._registrar_done = False
+        self.done = False
         self.data = {}
         return html.parser.HTMLParser.__init__(self)
 
+    def feed(self, data):
+        if self.done: return
+        try:
+            html.parser.HTMLParser.feed(self, data)
+        except backend.ParseComplete:
+            pass
+
+    def close(self):
+        if not self.done: html.parser.HTMLParser.close(self)
+
+    def _end_block(self):
+        if self._status == 1: self._registry_done = True
+        elif self._status == 2: self._registrar_done = True
+        self._status = 0
+        if self._stop_early and self._registry_done and self._registrar_done:
+            self.done = True
+            raise backend.ParseComplete()
+
     def handle_starttag(self, tag, attrs):
         if tag == "div" and attrs == [("class", "whois_result"), ("id","registryData")]:
             self._status = 1
@@ -92,20 +128,181 @@ class WhoIsHTMLParser(html.parser.HTMLParser):
                 elif k == "Registry Admin ID" : self.data["Admin"]["ID"] = v
                 elif k == "Registry Tech ID" : self.data["Tech"]["ID"] = v
                 else: self.data[k]=v
-                if k == "DNSSEC": self._status = 0
+                if k == "DNSSEC": self._end_block()
     def handle_endtag(self, tag):
-        self._status = 0
+        self._end_block()
+
+@instrument.measured("whois")
+def _fetch_who_is_page(domain_name, session=None, host_limits=None):
+    url = _whois_base_url + domain_name
+    if host_limits is None:
+        r = transport.get(url, session)
+    else:
+        with host_limits[urlparse.urlsplit(url).netloc]:
+            r = transport.get(url, session)
+    if r.status_code != requests.codes.ok:
+        r.raise_for_status()
+        return None
+    return r.text
 
-def who_is(domain_name):
+def _who_is_result(p):
+    if p.data == {}:
+        raise ValueError("Domain not found in the database.")
+    return instrument.result_size(p.data)
+
+@instrument.measured("whois")
+def who_is_from_str(html_data_str):
+    """
+    Return a json structure parsed from the whois.com page content `html_data_str`.
+    """
+    p = WhoIsHTMLParser(stop_early=True)
+    backend.parse(p, html_data_str)
+    return _who_is_result(p)
+
+@instrument.measured("whois")
+def who_is_from_file(local_html_file, stream=False, use_mmap=False):
+    """
+    Return a json structure parsed from the whois.com page saved as `local_html_file`.
+    With `stream` set, the file is read and parsed chunk by chunk, and reading stops once the registrar data is parsed.
+    With `use_mmap` set, the chunks are decoded from a memory map of the file instead of being read into buffers.
+    """
+    if stream or use_mmap:
+        p = WhoIsHTMLParser(stop_early=True)
+        if use_mmap: chunks = streaming.iter_mmap_text(local_html_file)
+        else: chunks = streaming.iter_file_text(local_html_file)
+        streaming.parse(p, chunks)
+        return _who_is_result(p)
+    with open(local_html_file, 'r', encoding="utf8") as f:
+        return who_is_from_str(f.read())
+
+def _stream_who_is(domain_name, session):
+    with transport.get(_whois_base_url + domain_name, session, stream=True) as r:
+        if r.status_code != requests.codes.ok:
+            r.raise_for_status()
+            return None
+        p = WhoIsHTMLParser(stop_early=True)
+        streaming.parse(p, streaming.iter_response_text(r))
+    return _who_is_result(p)
+
+@instrument.measured("whois")
+def who_is(domain_name, session=None, cache=None, stream=False):
     """
     Return a json structure containing information fetched from http://www.whois.com about the domain specified by `domain_name`.
+    The request is sent through the `transport.Session` `session`, or through the default one if it is None.
+    With a `cache.DiskCache` given as `cache`, results (including "not found" ones) are served from and saved to it.
+    With `stream` set, the page is parsed while it downloads and the download stops once the registrar data is parsed;
+    it has no effect when `cache` is given, as the whole page is stored.
     """
-    r = requests.get("http://www.whois.com/whois/"+domain_name)
-    if r.status_code != requests.codes.ok:
-        r.raise_for_status()
-    else:
-        p = WhoIsHTMLParser()
-        p.feed(r.text)
-        if p.data == {}:
-            raise ValueError("Domain not found in the database.")
-        return p.data
\ No newline at end of file
+    if cache is not None:
+        return cache.lookup("whois", domain_name, lambda: _fetch_who_is_page(domain_name, session), who_is_from_str)
+    if stream:
+        return _stream_who_is(domain_name, session)
+    text = _fetch_who_is_page(domain_name, session)
+    if text is not None:
+        return who_is_from_str(text)
+
+class _HostLimits():
+    def __init__(self, max_in_flight):
+        self._max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __getitem__(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self._max_in_flight)
+            return self._semaphores[host]
+
+def who_is_many(domain_names, max_workers=8, max_in_flight_per_host=None, session=None, cache=None):
+    """
+    Look up every domain in the iterable `domain_names` over a pool of `max_workers` fetch threads,
+    and yield `(domain_name, result)` pairs in completion order.
+    `result` is either what `who_is` would return, or the exception it would raise,
+    so one failing domain does not abort the batch.
+    At most `max_in_flight_per_host` requests are sent to the same host at once.
+    Pages are parsed on the consuming thread, so the fetch threads only wait on the network.
+    All fetch threads share `session` (or the default session), which should be given
+    a `pool_maxsize` of at least `max_workers` to keep every connection alive.
+    Domains found in `cache` are yielded without being fetched.
+    """
+    host_limits = None
+    if max_in_flight_per_host is not None:
+        host_limits = _HostLimits(max_in_flight_per_host)
+    def cached(domain_name):
+        entry = None if cache is None else cache.get("whois", domain_name)
+        return None if entry is None else bulk.finished(entry.value)
+    fetch = lambda domain_name: _fetch_who_is_page(domain_name, session, host_limits)
+    for domain_name, future in bulk.completed(fetch, domain_names, max_workers, cached=cached):
+        try:
+            text = future.result()
+            # Fetched pages are parsed here; results from the cache (dicts) and missing pages (None) are final.
+            if not isinstance(text, str): result = text
+            elif cache is None: result = who_is_from_str(text)
+            else: result = cache.store("whois", domain_name, text, who_is_from_str)
+        except Exception as e:
+            result = e
+        yield domain_name, result
+
+def _to_int(s):
+    try:
+        return int(s.strip())
+    except (AttributeError, ValueError):
+        return None
+
+def _as_list(v):
+    if v is None: return None
+    if isinstance(v, list): return v
+    return [v]
+
+class WhoIsRecord():
+    """
+    A compact version of the json structure returned by `who_is`, built with `WhoIsRecord.from_dict(who_is(domain))`.
+    The registry, registrar and contact sections stay dicts, `registrar_iana_id` is an int,
+    and `name_servers` is always a list. Keys not known here are kept in `other`.
+    As for `alexa.SiteInfo`, only these fields are kept and `to_dict()` formats them back the same way:
+    "Name Server" is always a list, and an IANA ID that is not a number is left out.
+    `WhoIsRecord.from_dict(record.to_dict()) == record` always holds.
+    """
+    __slots__ = ("domain_name", "registry_domain_id", "creation_date", "updated_date", "name_servers",
+        "domain_status", "dnssec", "registry", "registrar", "registrar_iana_id", "registrant", "admin", "tech",
+        "other")
+
+    _fields = (("Domain Name", "domain_name"), ("Registry Domain ID", "registry_domain_id"),
+        ("Creation Date", "creation_date"), ("Updated Date", "updated_date"), ("Domain Status", "domain_status"),
+        ("DNSSEC", "dnssec"), ("Registry", "registry"), ("Registrar", "registrar"),
+        ("Registrant", "registrant"), ("Admin", "admin"), ("Tech", "tech"))
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields: raise TypeError("Unknown WhoIsRecord fields: " + ", ".join(fields))
+
+    @classmethod
+    def from_dict(cls, d):
+        r = cls()
+        other = dict(d)
+        for key, name in cls._fields:
+            setattr(r, name, other.pop(key, None))
+        r.name_servers = _as_list(other.pop("Name Server", None))
+        if r.registrar is not None:
+            r.registrar = dict(r.registrar)
+            r.registrar_iana_id = _to_int(r.registrar.pop("IANA ID", None))
+        r.other = other
+        return r
+
+    def to_dict(self):
+        d = dict(self.other or {})
+        for key, name in self._fields:
+            value = getattr(self, name)
+            if value is not None: d[key] = value
+        if self.registrar is not None:
+            d["Registrar"] = dict(self.registrar)
+            if self.registrar_iana_id is not None: d["Registrar"]["IANA ID"] = str(self.registrar_iana_id)
+        if self.name_servers is not None: d["Name Server"] = list(self.name_servers)
+        return d
+
+    def __eq__(self, other):
+        return isinstance(other, WhoIsRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "WhoIsRecord(domain_name={0!r})".format(self.domain_name)
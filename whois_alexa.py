@@ -0,0 +1,205 @@
+"""
+The command line bulk runner: look up the domains or categories of a file, or of the standard input,
+and write the results as JSON Lines or Parquet, printing throughput and latency as it goes.
+
+Usage
+--------
+python -m whois_alexa whois domains.txt -o whois.jsonl.gz --concurrency 32 --rate 5 --cache-dir cache/
+python -m whois_alexa siteinfo sites.txt -o sites.parquet --format parquet --sections rank,country --processes 4
+cat categories.txt | python -m whois_alexa topsites -o topsites.jsonl
+
+Every line of the input is one item; blank lines and lines starting with "#" are skipped.
+JSON Lines records are `{"key": ..., "result": ...}`, or `{"key": ..., "error": ...}` for failed lookups.
+Statistics go to the standard error every `--stats-interval` seconds: items done, not found and failed,
+items per second, and percentiles of the time to first byte and of the parse time.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import alexa
+import bulk
+import cache
+import instrument
+import jsonl
+import pipeline
+import refresh
+import scheduler
+import transport
+import whois
+
+kinds = ("whois", "siteinfo", "topsites")
+formats = ("jsonl", "parquet")
+_calls = {"whois": "whois", "siteinfo": "alexa.siteinfo", "topsites": "alexa.topsites"}
+_cache_file = "lookups.sqlite"
+
+def _read_items(file_name):
+    f = sys.stdin if file_name is None or file_name == "-" else open(file_name, encoding="utf8")
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"): yield line
+    finally:
+        if f is not sys.stdin: f.close()
+
+def run(kind, items, concurrency=8, processes=None, disk_cache=None, sections=None, stream=False, refresh_cached=False):
+    """
+    Look up every item of `items` with the bulk path suited to the options, and yield `(item, result)` pairs
+    in completion order, where `result` is the result or the exception raised by the lookup.
+    `concurrency` is the number of requests in flight, `processes` the number of parser processes
+    (None parses on the fetching process), `disk_cache` a `cache.DiskCache`, and `sections` the siteinfo
+    sections to return. With `stream` set, siteinfo pages are parsed as they download.
+    With `refresh_cached` set, cached results are revalidated rather than served as they are.
+    """
+    if kind not in kinds: raise ValueError("Unknown lookup kind: " + str(kind))
+    if kind == "topsites":
+        return alexa.get_topsites_by_categories(items, max_in_flight=concurrency)
+    if refresh_cached and disk_cache is not None:
+        return refresh.Refresh(kind, disk_cache, max_workers=concurrency, sections=sections).run(items)
+    if processes is not None:
+        return pipeline.Pipeline(kind, fetch_workers=concurrency, processes=processes, cache=disk_cache,
+            sections=sections).run(items)
+    if kind == "whois":
+        return whois.who_is_many(items, max_workers=concurrency, cache=disk_cache)
+    return bulk.outcomes(lambda item: alexa.get_website_info(item, cache=disk_cache, stream=stream, sections=sections),
+        items, concurrency)
+
+class Stats():
+    """
+    Live statistics of a run: results and errors counted by `add`, and the latencies measured
+    by the `instrument.Collector` `collector` for the lookups of `kind`.
+    """
+    def __init__(self, kind, collector):
+        self.call = _calls[kind]
+        self.collector = collector
+        self.start = time.perf_counter()
+        self.results = 0
+        self.not_found = 0
+        self.errors = 0
+
+    def add(self, result):
+        self.results += 1
+        if isinstance(result, ValueError): self.not_found += 1
+        elif isinstance(result, Exception): self.errors += 1
+
+    def __str__(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        s = "{0} done ({1} not found, {2} errors) in {3:.1f}s: {4:.1f}/s".format(self.results, self.not_found,
+            self.errors, elapsed, self.results / elapsed)
+        phases = self.collector.summary().get(self.call, {})
+        for phase in ("ttfb", "parse"):
+            if phase in phases:
+                s += ", {0} p50 {1:.1f}ms p90 {2:.1f}ms p99 {3:.1f}ms".format(phase, phases[phase]["p50"] * 1000,
+                    phases[phase]["p90"] * 1000, phases[phase]["p99"] * 1000)
+        return s
+
+def _done_keys(file_name):
+    # The keys already in the JSON Lines output `file_name`, to resume an interrupted run.
+    if not os.path.exists(file_name): return set()
+    return set(record["key"] for record in jsonl.read(file_name))
+
+class _StdoutWriter():
+    def write_all(self, pairs):
+        for key, result in pairs:
+            if isinstance(result, Exception): record = {"key": key, "error": repr(result)}
+            else: record = {"key": key, "result": result}
+            sys.stdout.write(json.dumps(record, separators=(",", ":")))
+            sys.stdout.write("\n")
+
+    def close(self):
+        sys.stdout.flush()
+
+def _writer(args):
+    if args.format == "parquet":
+        import columnar
+        return columnar.ColumnarWriter(args.output, args.kind)
+    if args.output is None or args.output == "-": return _StdoutWriter()
+    compression = args.compression
+    if compression is None:
+        if args.output.endswith(".gz"): compression = "gzip"
+        elif args.output.endswith(".zst"): compression = "zstd"
+    return jsonl.JSONLinesWriter(args.output, compression, resume=args.resume)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m whois_alexa",
+        description="Look up whois.com and alexa.com data in bulk.")
+    parser.add_argument("kind", choices=kinds, help="lookup to run: whois (domains), siteinfo (websites) "
+        "or topsites (categories)")
+    parser.add_argument("input", nargs="?", help="file of items, one per line (default: standard input)")
+    parser.add_argument("-o", "--output", help="output file (default: standard output, for jsonl)")
+    parser.add_argument("--format", choices=formats, default="jsonl", help="output format (parquet needs pyarrow)")
+    parser.add_argument("--compression", choices=("gzip", "zstd"), help="jsonl compression "
+        "(default: from the file extension, .gz or .zst)")
+    parser.add_argument("--resume", action="store_true", help="append to the jsonl output, skipping the items in it")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--processes", type=int, help="parse in this many processes (whois and siteinfo)")
+    parser.add_argument("--rate", type=float, help="requests per second per host")
+    parser.add_argument("--burst", type=float, help="requests sent at once after an idle period")
+    parser.add_argument("--max-retries", type=int, default=3, help="retries of throttled and failed requests")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds before a request times out")
+    parser.add_argument("--cache-dir", help="directory of the response cache")
+    parser.add_argument("--refresh", action="store_true", help="revalidate cached results with conditional "
+        "requests (needs --cache-dir, not with --processes)")
+    parser.add_argument("--sections", help="comma-separated siteinfo sections, e.g. rank,country")
+    parser.add_argument("--stream", action="store_true", help="parse siteinfo pages as they download "
+        "(not with --processes or --cache-dir)")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="seconds between statistics lines")
+    parser.add_argument("--stats-file", help="save the timings per phase as .json when done")
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and args.output is None: parser.error("--format parquet needs --output")
+    if args.resume and (args.format != "jsonl" or args.output is None): parser.error("--resume needs a jsonl --output")
+    # Options the chosen lookup path would ignore are rejected rather than dropped.
+    if args.sections is not None and args.kind != "siteinfo": parser.error("--sections only applies to siteinfo")
+    if args.stream and args.kind != "siteinfo": parser.error("--stream only applies to siteinfo")
+    if args.kind == "topsites":
+        for option, value in (("--processes", args.processes), ("--cache-dir", args.cache_dir)):
+            if value is not None: parser.error(option + " does not apply to topsites")
+    if args.refresh and args.cache_dir is None: parser.error("--refresh needs --cache-dir")
+    if args.refresh and args.processes is not None: parser.error("--refresh cannot be used with --processes")
+    if args.stream:
+        # Pages parsed by other processes or stored in the cache are downloaded whole.
+        for option, value in (("--processes", args.processes), ("--cache-dir", args.cache_dir)):
+            if value is not None: parser.error("--stream cannot be used with " + option)
+    sections = None if args.sections is None else [s.strip() for s in args.sections.split(",") if s.strip()]
+    for section in sections or []:
+        if section not in alexa._section_ends: parser.error("unknown siteinfo section: " + section)
+
+    transport.configure(pool_maxsize=args.concurrency, timeout=args.timeout, scheduler=scheduler.Scheduler(
+        rate=args.rate, burst=args.burst, max_retries=args.max_retries, max_concurrency=args.concurrency))
+    disk_cache = None
+    if args.cache_dir is not None:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        disk_cache = cache.DiskCache(os.path.join(args.cache_dir, _cache_file))
+    # The writer is opened first, as resuming cuts off a torn tail whose keys must be looked up again.
+    writer = _writer(args)
+    items = _read_items(args.input)
+    if args.resume:
+        done = _done_keys(args.output)
+        items = (item for item in items if item not in done)
+
+    collector = instrument.Collector()
+    instrument.add_hook(collector)
+    stats = Stats(args.kind, collector)
+    last_report = time.perf_counter()
+    try:
+        for item, result in run(args.kind, items, args.concurrency, args.processes, disk_cache, sections,
+                args.stream, args.refresh):
+            writer.write_all([(item, result)])
+            stats.add(result)
+            if time.perf_counter() - last_report >= args.stats_interval:
+                last_report = time.perf_counter()
+                print(stats, file=sys.stderr)
+    except KeyboardInterrupt:
+        print("interrupted", file=sys.stderr)
+    finally:
+        writer.close()
+        if disk_cache is not None: disk_cache.close()
+        instrument.remove_hook(collector)
+    print(stats, file=sys.stderr)
+    if args.stats_file is not None: collector.export(args.stats_file)
+    return 1 if stats.results and stats.errors == stats.results else 0
+
+if __name__ == "__main__":
+    sys.exit(main())